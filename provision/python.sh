@@ -26,3 +26,15 @@ ${CONDA_BIN} create -n ${ENV_NAME} -y -q python=${PYTHON}
 
 echo "Installing requirements.txt"
 ${PYTHON_BIN} -m pip install --quiet -r /vagrant/requirements.txt 2> /dev/null
+
+echo "Configuring log rotation"
+cat > /etc/logrotate.d/lanxess <<EOF
+/home/vagrant/logs/lanxess/*.log {
+    size 50M
+    rotate 10
+    missingok
+    notifempty
+    compress
+    delaycompress
+}
+EOF
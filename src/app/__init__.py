@@ -20,6 +20,15 @@ def create_app(config_name: str):
 
     app.custom_logger = get_logger('main')
 
+    from .availability import availability_cache
+    availability_cache.init_app(app)
+
+    from .metrics import request_metrics
+    request_metrics.init_app(app)
+
+    from .profiling import request_profiler
+    request_profiler.init_app(app)
+
     from .main import main as main_blueprint
     app.register_blueprint(main_blueprint)
     return app
@@ -0,0 +1,502 @@
+"""
+Weekly availability of persons expanded from their templates.
+
+A person's recurring template is stored once and expanded into a week only when
+the week is scheduled: the timeslots allocated for the week are added to it and
+the week's exceptions are removed, so both work as a diff on top of the
+template. Employee's free timeslots are the expanded availability without the
+timeslots covered by employee's interviews of the week.
+
+Expanded and free masks are kept in `availability_cache` keyed by person and
+the version of person's availability. Every committed transaction changing
+person's template, allocations or exceptions (or deleting the person) bumps the
+version, so the outdated masks are never returned and are eventually evicted as
+the least recently used ones. Free masks are updated in place when employee's
+interviews are created or deleted instead of being computed again, and a free
+mask loaded while such an update happened is not cached. With several
+worker processes, versions are synchronized through PostgreSQL `LISTEN/NOTIFY`
+channel if `AVAILABILITY_CACHE_SYNC` is set. Each process starts listening on its
+first request, so the workers forked after the app is created have their own
+listeners. While a process is not listening (before its listener has started or
+while it reconnects after an error), the cache is bypassed, and it is cleared
+once the listener is connected, as the notifications may have been missed.
+"""
+import os
+import sys
+import time
+import select
+import threading
+from collections import OrderedDict
+
+from sqlalchemy import event, literal, union_all
+
+from . import db
+from .models import Employee, Candidate, Interview
+from .models import EmployeeAvailability, CandidateAvailability
+from .models import EmployeeTemplate, CandidateTemplate
+from .models import EmployeeException, CandidateException
+from scheduling.slots import EMPTY, span, apply_diff, to_intervals
+
+
+NOTIFY_CHANNEL = 'availability'
+RECONNECT_DELAY = 1
+MAX_RECONNECT_DELAY = 60
+
+# person model -> (person column name, allocations, template, exceptions)
+SOURCES = {
+    Employee: ('employee_id',
+               EmployeeAvailability, EmployeeTemplate, EmployeeException),
+    Candidate: ('candidate_id',
+                CandidateAvailability, CandidateTemplate, CandidateException)
+}
+
+_owners = {model: (person_cls, sources[0])
+           for person_cls, sources in SOURCES.items()
+           for model in sources[1:]}
+
+
+class AvailabilityCache:
+    """
+    LRU cache of masks keyed by person's type, ID and availability version, the
+    week and the kind of mask (either 'availability' or 'free').
+
+    The cache size is capped by the approximate number of bytes taken by its keys
+    and masks. Hits, misses and evictions are counted since the cache creation.
+    """
+
+    def __init__(self, max_bytes=16 * 2**20):
+        self.max_bytes = max_bytes
+        self.sync = False
+        self.hits = self.misses = self.evictions = 0
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._revisions = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        self._app = self._logger = None
+        self._listener_pid = self._listening_pid = None
+
+    def init_app(self, app):
+        self.max_bytes = app.config['AVAILABILITY_CACHE_MAX_BYTES']
+        self.sync = app.config['AVAILABILITY_CACHE_SYNC']
+        self._app = app
+        self._logger = app.custom_logger
+        if self.sync:
+            app.before_request(self.start_listener)
+
+    @property
+    def listening(self):
+        return self._listening_pid == os.getpid()
+
+    @property
+    def enabled(self):
+        """Cached masks are used unless they may have missed other processes' changes."""
+
+        return not self.sync or self.listening
+
+    def start_listener(self):
+        """Starts synchronizing versions in the current process if not started yet."""
+
+        if self._listener_pid == os.getpid():
+            return
+        with self._lock:
+            if self._listener_pid != os.getpid():
+                self._listener_pid = os.getpid()
+                threading.Thread(target=self._listen, daemon=True).start()
+
+    def version(self, person_cls, person_id):
+        return self._versions.get((_person_type(person_cls), person_id), 0)
+
+    def revision(self, person_cls, person_id):
+        """Returns the number of in-place updates of person's cached masks."""
+
+        return self._revisions.get((_person_type(person_cls), person_id), 0)
+
+    def get(self, person_cls, person_id, version, week, kind='availability'):
+        key = _person_type(person_cls), person_id, version, week, kind
+        with self._lock:
+            mask = self._entries.get(key) if self.enabled else None
+            if mask is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return mask
+
+    def put(self, person_cls, person_id, version, week, mask, kind='availability',
+            revision=None):
+        """
+        Stores person's mask. If `revision` is given and person's masks were
+        updated in place since it was read, the mask may miss the update, so it
+        is not stored.
+        """
+        key = _person_type(person_cls), person_id, version, week, kind
+        with self._lock:
+            if not self.enabled:
+                return
+            if revision is not None and revision != self._revisions.get(key[:2], 0):
+                return
+            self._discard(key)
+            self._entries[key] = mask
+            self._size += _entry_size(key, mask)
+            while self._size > self.max_bytes and self._entries:
+                old_key, old_mask = self._entries.popitem(last=False)
+                self._size -= _entry_size(old_key, old_mask)
+                self.evictions += 1
+
+    def update(self, person_cls, person_id, week, kind, function):
+        """
+        Replaces the cached mask of person's current version with the result of
+        function called with it. Does nothing if there is no such mask.
+        """
+        version = self.version(person_cls, person_id)
+        key = _person_type(person_cls), person_id, version, week, kind
+        with self._lock:
+            self._revise(key[:2])
+            if key in self._entries:
+                mask = function(self._discard(key))
+                self._entries[key] = mask
+                self._size += _entry_size(key, mask)
+
+    def peek(self, person_cls, person_id, week, kind='availability'):
+        """Returns the mask of person's current version without counting a hit."""
+
+        if not self.enabled:
+            return None
+        version = self.version(person_cls, person_id)
+        return self._entries.get(
+            (_person_type(person_cls), person_id, version, week, kind))
+
+    def discard(self, person_cls, person_id, week, kind):
+        version = self.version(person_cls, person_id)
+        key = _person_type(person_cls), person_id, version, week, kind
+        with self._lock:
+            self._revise(key[:2])
+            self._discard(key)
+
+    def bump(self, person_type, person_id):
+        """Makes all cached masks of person outdated."""
+
+        with self._lock:
+            key = person_type, person_id
+            self._versions[key] = self._versions.get(key, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'size_in_bytes': self._size,
+                'max_bytes': self.max_bytes}
+
+    def _discard(self, key):
+        mask = self._entries.pop(key, None)
+        if mask is not None:
+            self._size -= _entry_size(key, mask)
+        return mask
+
+    def _revise(self, person_key):
+        self._revisions[person_key] = self._revisions.get(person_key, 0) + 1
+
+    def _listen(self):
+        """
+        Bumps versions changed by other processes until the process exits,
+        reconnecting with growing delays after errors.
+        """
+        delay = RECONNECT_DELAY
+        while True:
+            connection = None
+            try:
+                with self._app.app_context():
+                    connection = db.engine.raw_connection()
+                    connection.detach()
+                connection = connection.connection
+                connection.autocommit = True
+                connection.cursor().execute(f'LISTEN {NOTIFY_CHANNEL}')
+                self.clear()
+                self._listening_pid = os.getpid()
+                delay = RECONNECT_DELAY
+                self._receive(connection)
+            except Exception:
+                self._listening_pid = None
+                self._logger.exception('Availability cache listener failed, '
+                                       'reconnecting in %gs', delay)
+            finally:
+                if connection is not None:
+                    try:
+                        connection.close()
+                    except Exception:
+                        pass
+            time.sleep(delay)
+            delay = min(2 * delay, MAX_RECONNECT_DELAY)
+
+    def _receive(self, connection):
+        while True:
+            if select.select([connection], [], [], 60) == ([], [], []):
+                continue
+            connection.poll()
+            while connection.notifies:
+                payload = connection.notifies.pop(0).payload
+                person_type, person_id, pid = payload.split(':')
+                if int(pid) != os.getpid():
+                    self.bump(person_type, int(person_id))
+
+
+availability_cache = AvailabilityCache()
+
+
+def availability_masks(person_cls, person_ids, week):
+    """
+    Returns expanded availability of persons for the week keyed by person's ID.
+    The persons missing from cache are loaded with a single query.
+    """
+    masks, missing = {}, {}
+    for person_id in person_ids:
+        version = availability_cache.version(person_cls, person_id)
+        mask = availability_cache.get(person_cls, person_id, version, week)
+        if mask is None:
+            missing[person_id] = version
+        else:
+            masks[person_id] = mask
+    if missing:
+        for person_id, mask in _load_masks(person_cls, list(missing), week).items():
+            availability_cache.put(person_cls, person_id, missing[person_id], week, mask)
+            masks[person_id] = mask
+    return masks
+
+
+def free_masks(employees_ids, week):
+    """
+    Returns employees' availability for the week without the timeslots of their
+    interviews keyed by employee's ID. The masks missing from cache are computed
+    with at most two queries.
+
+    The computed masks are not cached if employee's interviews were committed
+    while they were loaded, as the masks may miss them.
+    """
+    masks, missing = {}, {}
+    for employee_id in employees_ids:
+        version = availability_cache.version(Employee, employee_id)
+        mask = availability_cache.get(Employee, employee_id, version, week, 'free')
+        if mask is None:
+            revision = availability_cache.revision(Employee, employee_id)
+            missing[employee_id] = version, revision
+        else:
+            masks[employee_id] = mask
+    if missing:
+        available = availability_masks(Employee, list(missing), week)
+        booked = booked_masks(list(missing), week)
+        for employee_id, (version, revision) in missing.items():
+            mask = available[employee_id] & ~booked.get(employee_id, EMPTY)
+            availability_cache.put(Employee, employee_id, version, week, mask, 'free',
+                                   revision=revision)
+            masks[employee_id] = mask
+    return masks
+
+
+def booked_masks(employees_ids, week):
+    """Returns timeslots of the week taken by employees' interviews."""
+
+    rows = (db.session.query(Interview.employee_id,
+                             Interview.start_id,
+                             Interview.duration_in_timeslots)
+            .filter(Interview.week == week)
+            .filter(Interview.employee_id.in_(employees_ids)))
+    masks = {}
+    for employee_id, start, length in rows:
+        masks[employee_id] = masks.get(employee_id, EMPTY) | span(start, length)
+    return masks
+
+
+def register_bookings(session, bookings, booked=True):
+    """
+    Marks `(employee_id, week, start, length)` bookings as created (or deleted)
+    within session's transaction, so employees' free masks are updated after
+    commit. Interviews created or deleted through the session are registered
+    automatically, this is needed for bulk operations only.
+    """
+    changes = session.info.setdefault('interview_changes', [])
+    for employee_id, week, start, length in bookings:
+        changes.append((employee_id, week, start, length, booked))
+        _notify(session, _person_type(Employee), employee_id)
+
+
+def store_mask(person_cls, person_id, week, mask):
+    """Writes through person's availability for the week changed by a request."""
+
+    version = availability_cache.version(person_cls, person_id)
+    availability_cache.put(person_cls, person_id, version, week, mask)
+
+
+def _person_type(person_cls):
+    return person_cls.__name__.lower()
+
+
+def _entry_size(key, mask):
+    return sys.getsizeof(key) + sys.getsizeof(mask)
+
+
+def week_diff(person_cls, person_id, week):
+    """Returns person's template, allocated and excluded timeslots of the week."""
+
+    diff = _load_diffs(person_cls, [person_id], week)[person_id]
+    return diff['template'], diff['allocated'], diff['exceptions']
+
+
+def write_week(person_cls, person_id, week, allocated, exceptions):
+    """
+    Replaces person's allocated and excluded intervals of the week with the ones
+    of given masks using a single statement.
+
+    Intervals starting at the same timeslot as before are upserted in place and
+    the rest of person's intervals of the week are deleted, so the unchanged
+    intervals are not rewritten and the person's other weeks are not touched.
+    """
+    person_key, allocations, _, excluded = SOURCES[person_cls]
+    allocated, exceptions = to_intervals(allocated), to_intervals(exceptions)
+    statement = _WRITE_WEEK.format(person_key=person_key,
+                                   allocations=allocations.__tablename__,
+                                   exceptions=excluded.__tablename__)
+    db.session.execute(db.text(statement), {
+        'person_id': person_id,
+        'week': week,
+        'allocated_starts': [start for start, _ in allocated],
+        'allocated_ends': [end for _, end in allocated],
+        'excluded_starts': [start for start, _ in exceptions],
+        'excluded_ends': [end for _, end in exceptions]})
+    register_change(db.session, person_cls, person_id)
+
+
+def register_change(session, person_cls, person_id):
+    """
+    Marks person's availability as changed within session's transaction. Changes
+    made through the ORM are registered automatically, this is needed for
+    statements bypassing it only.
+    """
+    changes = session.info.setdefault('availability_changes', set())
+    key = _person_type(person_cls), person_id
+    if key not in changes:
+        _notify(session, *key)
+        changes.add(key)
+
+
+_WRITE_WEEK = """
+    WITH deleted_allocations AS (
+        DELETE FROM {allocations}
+        WHERE {person_key} = :person_id AND week = :week
+          AND start_slot <> ALL(CAST(:allocated_starts AS smallint[]))
+    ), deleted_exceptions AS (
+        DELETE FROM {exceptions}
+        WHERE {person_key} = :person_id AND week = :week
+          AND start_slot <> ALL(CAST(:excluded_starts AS smallint[]))
+    ), upserted_exceptions AS (
+        INSERT INTO {exceptions} AS t ({person_key}, week, start_slot, end_slot)
+        SELECT :person_id, :week, start_slot, end_slot
+        FROM unnest(CAST(:excluded_starts AS smallint[]),
+                    CAST(:excluded_ends AS smallint[])) AS u (start_slot, end_slot)
+        ON CONFLICT ({person_key}, week, start_slot) DO UPDATE
+        SET end_slot = excluded.end_slot WHERE t.end_slot <> excluded.end_slot
+    )
+    INSERT INTO {allocations} AS t ({person_key}, week, start_slot, end_slot)
+    SELECT :person_id, :week, start_slot, end_slot
+    FROM unnest(CAST(:allocated_starts AS smallint[]),
+                CAST(:allocated_ends AS smallint[])) AS u (start_slot, end_slot)
+    ON CONFLICT ({person_key}, week, start_slot) DO UPDATE
+    SET end_slot = excluded.end_slot WHERE t.end_slot <> excluded.end_slot
+"""
+
+
+def _load_masks(person_cls, person_ids, week):
+    return {person_id: apply_diff(diff['template'], diff['allocated'], diff['exceptions'])
+            for person_id, diff in _load_diffs(person_cls, person_ids, week).items()}
+
+
+def _load_diffs(person_cls, person_ids, week):
+    person_key, allocations, template, exceptions = SOURCES[person_cls]
+
+    def intervals(model, source, *criteria):
+        return (db.select([getattr(model, person_key).label('person_id'),
+                           literal(source).label('source'),
+                           model.start_slot,
+                           model.end_slot])
+                .where(getattr(model, person_key).in_(person_ids))
+                .where(*criteria))
+
+    query = union_all(
+        intervals(template, 'template'),
+        intervals(allocations, 'allocated', allocations.week == week),
+        intervals(exceptions, 'exceptions', exceptions.week == week))
+
+    diffs = {person_id: {'template': EMPTY, 'allocated': EMPTY, 'exceptions': EMPTY}
+             for person_id in person_ids}
+    for person_id, source, start, end in db.session.execute(query):
+        diffs[person_id][source] |= span(start, end - start)
+    return diffs
+
+
+@event.listens_for(db.session, 'after_flush')
+def _collect_changes(session, flush_context):
+    changes = session.info.setdefault('availability_changes', set())
+    flushed = set()
+    for obj in session.new | session.deleted:
+        if type(obj) is Interview:
+            booking = obj.employee_id, obj.week, obj.start_id, obj.duration_in_timeslots
+            register_bookings(session, [booking], booked=obj in session.new)
+        elif type(obj) in _owners:
+            person_cls, person_key = _owners[type(obj)]
+            flushed.add((_person_type(person_cls), getattr(obj, person_key)))
+        elif type(obj) in SOURCES and obj in session.deleted:
+            flushed.add((_person_type(type(obj)), obj.id))
+    for obj in session.dirty:
+        # changed intervals and rescheduled interviews are not tracked incrementally
+        if type(obj) in _owners:
+            person_cls, person_key = _owners[type(obj)]
+            flushed.add((_person_type(person_cls), getattr(obj, person_key)))
+        elif type(obj) is Interview:
+            flushed.add((_person_type(Employee), obj.employee_id))
+    for person_type, person_id in flushed - changes:
+        _notify(session, person_type, person_id)
+    changes |= flushed
+
+
+def _notify(session, person_type, person_id):
+    """Makes other processes bump person's version once the transaction commits."""
+
+    if availability_cache.sync:
+        session.connection().execute(
+            db.text('SELECT pg_notify(:channel, :payload)'),
+            {'channel': NOTIFY_CHANNEL,
+             'payload': f'{person_type}:{person_id}:{os.getpid()}'})
+
+
+@event.listens_for(db.session, 'after_commit')
+def _apply_changes(session):
+    for person_type, person_id in session.info.pop('availability_changes', ()):
+        availability_cache.bump(person_type, person_id)
+    for employee_id, week, start, length, booked in session.info.pop(
+            'interview_changes', ()):
+        _update_free_mask(employee_id, week, span(start, length), booked)
+
+
+def _update_free_mask(employee_id, week, window, booked):
+    if booked:
+        availability_cache.update(Employee, employee_id, week, 'free',
+                                  lambda free: free & ~window)
+        return
+    available = availability_cache.peek(Employee, employee_id, week)
+    if available is None:
+        availability_cache.discard(Employee, employee_id, week, 'free')
+    else:
+        availability_cache.update(Employee, employee_id, week, 'free',
+                                  lambda free: free | window & available)
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _discard_changes(session, previous_transaction):
+    session.info.pop('availability_changes', None)
+    session.info.pop('interview_changes', None)
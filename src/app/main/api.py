@@ -2,16 +2,53 @@
 Interviews management API.
 """
 import re
+import json
+import base64
+import itertools
 from collections import namedtuple
 
-from flask import jsonify, request, current_app
+from flask import Response, abort, jsonify, request, current_app, stream_with_context
+from sqlalchemy import func, literal, union_all, tuple_, exists, or_
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.orm.exc import StaleDataError
 from werkzeug.exceptions import HTTPException
 
 from . import main
 from .. import db
-from ..models import days_of_week, TIMESLOT_DURATION
-from ..models import Employee, Candidate, Timeslot
+from ..models import Employee, Candidate, Interview
+from ..models import EmployeeAvailability, CandidateAvailability
+from ..models import EmployeeTemplate, CandidateTemplate
+from ..models import EmployeeException, CandidateException
 from ..models import entity_with_id
+from ..availability import availability_masks, free_masks, availability_cache
+from ..availability import store_mask, register_bookings, booked_masks, SOURCES
+from ..availability import week_diff, write_week
+from scheduling.slots import days_of_week, TIMESLOT_DURATION, SLOTS_PER_WEEK, FULL_WEEK
+from scheduling.slots import EMPTY, slot_index, slot_parts, iter_indices, to_indices
+from scheduling.slots import to_mask, to_base64, apply_diff, span
+from ..weeks import current_week, next_week, parse_week
+from scheduling.matching import BatchScheduler, SchedulingRequest
+from scheduling.search import SCHEDULING_MODES, PersonAvailability
+from scheduling.search import duration_in_timeslots, interview_starts
+from scheduling.search import panel_starts, panel_members, panel_groups
+from ..metrics import request_metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+
+
+INTERSECTION_STRATEGIES = ('bitset', 'sql')
+NDJSON_MIMETYPE = 'application/x-ndjson'
+SLOTS_ENCODERS = {'verbose': None, 'indices': to_indices, 'mask': to_base64}
+ENCODING_MIMETYPES = {
+    'application/vnd.lanxess.indices+json': 'indices',
+    'application/vnd.lanxess.mask+json': 'mask'
+}
+LISTED_FIELDS = {
+    Employee: ('id', 'first_name', 'last_name'),
+    Candidate: ('id', 'first_name', 'last_name', 'email', 'skype')
+}
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+LOCAL_ADDRESSES = ('127.0.0.1', '::1')
+WEEK_ERROR = 'week should be a date within the scheduling horizon (YYYY-MM-DD)'
 
 
 @main.route('/api/v1/echo', methods=['GET'])
@@ -29,6 +66,9 @@ def employee_endpoint():
         * first_name (str): The first name of employee.
         * last_name (str): The last name of employee.
 
+    POST returns the ID of created employee, or the ID of existing employee with
+    the same name and `created` flag set to false.
+
     """
     ok, result = _get_json_keys('first_name', 'last_name')
     if not ok:
@@ -37,15 +77,16 @@ def employee_endpoint():
     payload = result.payload
 
     if request.method == 'GET':
-        employee = Employee.query.filter_by(**payload).first()
+        employee = (Employee.query
+                    .options(selectinload(Employee.interviews))
+                    .filter_by(**payload)
+                    .first())
         if employee is None:
             return api_bad_request(f'employee is not found')
 
         interviews_records = [{
-            'start': {
-                'day': interview.start.day,
-                'hour': interview.start.hour,
-                'minute': interview.start.minute},
+            'start': _schedule_record(interview.start_id),
+            'week': interview.week.isoformat(),
             'start_verbose': interview.verbose_start,
             'duration_in_minutes': interview.duration_in_minutes,
             'duration_verbose': interview.verbose_duration
@@ -55,13 +96,8 @@ def employee_endpoint():
         return success(payload)
 
     elif request.method == 'POST':
-        if Employee.exists(**payload):
-            return api_bad_request('cannot create employee: the record already exist')
-
-        employee = Employee(**payload)
-        db.session.add(employee)
-        db.session.commit()
-        return success({'id': employee.id})
+        employee_id, created = Employee.insert_or_get(**payload)
+        return success({'id': employee_id, 'created': created})
 
     elif request.method == 'DELETE':
         employee = Employee.query.filter_by(**payload).first()
@@ -86,6 +122,9 @@ def candidate_endpoint():
         * email (str): Candidate's email
         * skype (str): Candidate's Skype
 
+    POST returns the ID of created candidate, or the ID of existing candidate with
+    the same name and `created` flag set to false.
+
     """
     ok, result = _get_json_keys('first_name', 'last_name')
     if not ok:
@@ -94,7 +133,10 @@ def candidate_endpoint():
     payload = result.payload
 
     if request.method == 'GET':
-        candidate = Candidate.query.filter_by(**payload).first()
+        candidate = (Candidate.query
+                     .options(joinedload(Candidate.interview))
+                     .filter_by(**payload)
+                     .first())
         if candidate is None:
             return api_bad_request(f'candidate is not found')
 
@@ -105,10 +147,8 @@ def candidate_endpoint():
         if candidate.interview is not None:
             interview_obj = candidate.interview
             interview = {
-                'start': {
-                    'day': interview_obj.start.day,
-                    'hour': interview_obj.start.hour,
-                    'minute': interview_obj.start.minute},
+                'start': _schedule_record(interview_obj.start_id),
+                'week': interview_obj.week.isoformat(),
                 'start_verbose': interview_obj.verbose_start,
                 'duration_in_minutes': interview_obj.duration_in_minutes,
                 'duration_verbose': interview_obj.verbose_duration}
@@ -117,19 +157,14 @@ def candidate_endpoint():
         return success(record)
 
     elif request.method == 'POST':
-        if Candidate.exists(**payload):
-            return api_bad_request('cannot create candidate: the record already exist')
-
         email = request.json.get('email')
         if email is None:
             return api_bad_request('cannot create candidate without email')
 
         payload['email'] = email
         payload['skype'] = request.json.get('skype')
-        candidate = Candidate(**payload)
-        db.session.add(candidate)
-        db.session.commit()
-        return success({'id': candidate.id})
+        candidate_id, created = Candidate.insert_or_get(**payload)
+        return success({'id': candidate_id, 'created': created})
 
     elif request.method == 'DELETE':
         candidate = Candidate.query.filter_by(**payload).first()
@@ -141,36 +176,129 @@ def candidate_endpoint():
         return success({'id': candidate.id})
 
 
+@main.route('/api/v1/employees', methods=['GET'])
+def list_employees():
+    """
+    Lists employees ordered by last and first name, page by page.
+
+    Optional query string parameters:
+        * limit (int): The maximal number of employees on page, up to 500.
+            Defaults to 50.
+        * after (str): The `next` cursor returned with the previous page.
+        * prefix (str): Only the employees whose last name starts with prefix.
+        * has_availability (bool): Only the employees having (or not having, if
+            false) a template or allocated timeslots of the current or later weeks.
+        * has_interview (bool): Only the employees having (or not) interviews.
+        * fields (str): Comma-separated list of returned fields, out of `id`,
+            `first_name` and `last_name`. Defaults to all of them.
+
+    Pages are fetched by the position of the last listed employee instead of an
+    offset, so every page takes the same time regardless of its number.
+
+    """
+    return _list_persons(Employee, Interview.employee_id, 'employees')
+
+
+@main.route('/api/v1/candidates', methods=['GET'])
+def list_candidates():
+    """
+    Lists candidates ordered by last and first name, page by page.
+
+    The parameters are the same as for `list_employees`, and the fields are `id`,
+    `first_name`, `last_name`, `email` and `skype`.
+
+    """
+    return _list_persons(Candidate, Interview.candidate_id, 'candidates')
+
+
 @main.route('/api/v1/allocate_employee_time', methods=['POST'])
 def allocate_employee_time():
     """
-    Allocates free timeslots for interview for employee or candidate.
+    Allocates free timeslots for interview for employee.
 
     Required parameters:
         * employee_id (int): An ID of employee to allocate time.
+
+    And either a single timeslot:
         * day (str): An interview day.
         * time (str): Time value in format 'hh:mm', converted to the closest discrete timeslot.
 
-    """
-    req = TimeAllocationRequest(request, ('employee_id', 'day', 'time'))
-    if not req.validate():
-        return req.error
+    Or a list of timeslots and time ranges:
+        * slots (list): A list of objects with `day` key and either `time` key, or
+            `from` and `to` keys defining time range (not including its end), like
+            {"day": "Monday", "from": "09:00", "to": "17:00"}. The range should end
+            after it starts, "24:00" ends it at midnight.
 
-    timeslot = req.create_or_query_timeslot()
-    employee_id = req.parsed('employee_id')
-    employee = entity_with_id(Employee, employee_id)
-    if employee is None:
-        return api_bad_request('employee ID=%d does not exist' % employee_id)
+    Optional parameters:
+        * week (str): Any date of the week to allocate time in, formatted as
+            'YYYY-MM-DD'. Defaults to the next week.
+        * available (bool): If false, the timeslots are excluded from employee's
+            availability for the week instead, even if they are included into
+            employee's template. Defaults to true.
 
-    if timeslot not in employee.availability:
-        employee.availability.append(timeslot)
-
-    return _create_availability_response(employee)
+    """
+    return _allocate_time(Employee, 'employee_id')
 
 
 @main.route('/api/v1/allocate_candidate_time', methods=['POST'])
 def allocate_candidate_time():
-    return api_bad_request('not implemented')
+    """
+    Allocates free timeslots for interview for candidate.
+
+    Required parameters:
+        * candidate_id (int): An ID of candidate to allocate time.
+
+    The timeslots are defined in the same way as for `allocate_employee_time`.
+
+    """
+    return _allocate_time(Candidate, 'candidate_id')
+
+
+@main.route('/api/v1/employee_template', methods=['GET', 'POST', 'DELETE'])
+def employee_template():
+    """
+    Manages timeslots when employee is available every week. The template is
+    expanded into a week only when the week is scheduled, and the timeslots
+    allocated for a specific week are applied on top of it.
+
+    Required parameters:
+        * employee_id (int): An ID of employee.
+
+    POST-specific parameters:
+        * slots (list): Timeslots replacing the current template, defined in the
+            same way as for `allocate_employee_time`.
+
+    """
+    return _manage_template(Employee, EmployeeTemplate, 'employee_id')
+
+
+@main.route('/api/v1/candidate_template', methods=['GET', 'POST', 'DELETE'])
+def candidate_template():
+    """
+    Manages timeslots when candidate is available every week.
+
+    The parameters are the same as for `employee_template` with `candidate_id`
+    instead of `employee_id`.
+
+    """
+    return _manage_template(Candidate, CandidateTemplate, 'candidate_id')
+
+
+@main.route('/api/v1/availability_cache', methods=['GET'])
+def availability_cache_stats():
+    """Returns hits, misses and evictions counters of availability cache."""
+    return success(availability_cache.stats())
+
+
+@main.route('/api/v1/metrics', methods=['GET'])
+def metrics():
+    """
+    Returns request latency and SQL statements histograms per route in Prometheus
+    text format. Available from the local host only.
+    """
+    if request.remote_addr not in LOCAL_ADDRESSES:
+        abort(403)
+    return Response(request_metrics.render(), mimetype=METRICS_CONTENT_TYPE)
 
 
 @main.route('/api/v1/list_interviews', methods=['GET'])
@@ -179,10 +307,35 @@ def list_interviews():
     Returns list of available interview timeslots for a specific candidate and a given
     list of interviewers.
 
+    The timeslots already taken by interviewers' interviews are never offered.
+
     Required parameters:
         * candidate (int): An ID of interviewed candidate.
         * employees (list): A list of employees considered to carry out interview.
 
+    Optional parameters:
+        * duration (int): Interview duration in minutes, rounded up to the whole number
+            of timeslots. Only the timeslots starting a long enough free window are
+            returned. Defaults to a single timeslot.
+        * mode (str): One of the following scheduling modes:
+            - 'each' (default): timeslots are listed for every interviewer separately;
+            - 'all': timeslots when all listed interviewers are free at the same time;
+            - 'k_of_n': timeslots when at least `k` of listed interviewers are free.
+        * k (int): The number of interviewers required in 'k_of_n' mode.
+        * strategy (str): Where common timeslots are computed:
+            - 'bitset' (default): availability is loaded and intersected in memory;
+            - 'sql': common timeslots are found by the database in a single query.
+        * week (str): Any date of the scheduled week formatted as 'YYYY-MM-DD'.
+            Defaults to the next week.
+
+    If the request accepts `application/x-ndjson`, the schedule records are streamed
+    one per line as soon as they are produced instead of being wrapped into a single
+    JSON object.
+
+    The timeslots are encoded as described in `_response_encoding`. With a compact
+    encoding, each record contains the interviewer (or the group of interviewers)
+    and all of their timeslots in `slots` key instead of a record per timeslot.
+
     """
     keys = 'candidate', 'employees'
     ok, result = _get_json_keys(*keys)
@@ -190,95 +343,330 @@ def list_interviews():
         return result.error
 
     candidate_id, employees_list = _unwrap(keys, result.payload)
+    length = duration_in_timeslots(request.json.get('duration', TIMESLOT_DURATION))
+    if length is None:
+        return api_bad_request('duration should be a positive number of minutes')
+
+    mode = request.json.get('mode', 'each')
+    if mode not in SCHEDULING_MODES:
+        return api_bad_request('unknown scheduling mode: %s' % mode)
+
+    strategy = request.json.get('strategy', 'bitset')
+    if strategy not in INTERSECTION_STRATEGIES:
+        return api_bad_request('unknown intersection strategy: %s' % strategy)
+
+    week = _requested_week()
+    if week is None:
+        return api_bad_request(WEEK_ERROR)
+
     candidate = entity_with_id(Candidate, candidate_id)
     if candidate is None:
         return api_bad_request('candidate with ID=%d is not found' % candidate_id)
 
-    employees = Employee.query.filter(Employee.id.in_(employees_list))
-    schedule = []
-    for employee in employees:
-        common_timeslots = [
-            ts for ts in employee.availability if ts in candidate.availability]
-        if not common_timeslots:
-            continue
-        for timeslot in common_timeslots:
-            record = {
-                'interviewer': employee.full_name,
-                'day': timeslot.day,
-                'hour': timeslot.hour,
-                'minute': timeslot.minute}
-            schedule.append(record)
-
-    if not schedule:
+    employees = (Employee.query
+                 .filter(Employee.id.in_(employees_list))
+                 .all())
+    if mode != 'each':
+        missing = set(employees_list) - {employee.id for employee in employees}
+        if missing:
+            return api_bad_request('employee with ID=%d is not found' % min(missing))
+
+    required = len(employees)
+    if mode == 'k_of_n':
+        required = request.json.get('k')
+        if not isinstance(required, int) or not 0 < required <= len(employees):
+            return api_bad_request('k should be between 1 and the number of employees')
+
+    if strategy == 'sql':
+        candidate_mask = FULL_WEEK
+        employees_masks = _common_masks_sql(candidate.id, employees_list, week)
+    else:
+        candidate_mask = availability_masks(Candidate, [candidate.id], week)[candidate.id]
+        employees_masks = free_masks(employees_list, week)
+
+    available = [PersonAvailability(employee.id, employee.full_name,
+                                    employees_masks.get(employee.id, EMPTY))
+                 for employee in employees]
+    starts = interview_starts(available, length, candidate_mask)
+
+    encoding = _response_encoding()
+    if encoding is None:
+        return api_bad_request('unknown encoding')
+
+    records = _iter_schedule(mode, starts, required, encoding)
+    first = next(records, None)
+    if first is None:
         return api_bad_request('no available timeslots')
 
-    return success({'schedule': schedule})
+    records = itertools.chain([first], records)
+    if _accepts_ndjson():
+        return _ndjson_response(records)
+
+    return success({'encoding': encoding, 'schedule': list(records)})
+
+
+@main.route('/api/v1/schedule_batch', methods=['POST'])
+def schedule_batch():
+    """
+    Assigns interviewers and interview timeslots to many candidates at once so that
+    no interviewer gets two interviews at the same time, and creates interviews.
+
+    Required parameters:
+        * requests (list): A list of objects with the following keys:
+            - candidate (int): An ID of interviewed candidate.
+            - employees (list): A pool of employees able to carry out the interview.
+            - duration (int, optional): Interview duration in minutes. Defaults to
+                a single timeslot.
+
+    Optional parameters:
+        * week (str): Any date of the scheduled week formatted as 'YYYY-MM-DD'.
+            Defaults to the next week.
+
+    The candidates which already have an interview or cannot be placed into any free
+    window are returned in the list of unassigned candidates.
+
+    """
+    ok, result = _get_json_keys('requests')
+    if not ok:
+        return result.error
+
+    entries = result.payload['requests']
+    if not isinstance(entries, list):
+        return api_bad_request('requests should be a list')
+
+    week = _requested_week()
+    if week is None:
+        return api_bad_request(WEEK_ERROR)
+
+    parsed = []
+    for entry in entries:
+        if not isinstance(entry, dict) or not {'candidate', 'employees'} <= set(entry):
+            return api_bad_request('each request should include candidate and employees')
+        length = duration_in_timeslots(entry.get('duration', TIMESLOT_DURATION))
+        if length is None:
+            return api_bad_request('duration should be a positive number of minutes')
+        parsed.append((entry['candidate'], entry['employees'], length))
+
+    candidates_ids = [candidate_id for candidate_id, _, _ in parsed]
+    employees_ids = {employee_id for _, pool, _ in parsed for employee_id in pool}
+
+    _, existing = _lock_persons(employees_ids, candidates_ids)
+    for candidate_id in candidates_ids:
+        if candidate_id not in existing:
+            db.session.rollback()
+            return api_bad_request('candidate with ID=%d is not found' % candidate_id)
+    already_scheduled = {candidate_id for candidate_id, in db.session.query(
+        Interview.candidate_id).filter(Interview.candidate_id.in_(candidates_ids))}
+
+    candidates_masks = availability_masks(Candidate, candidates_ids, week)
+    employees_masks = free_masks(employees_ids, week)
+
+    requests, unassigned, seen = [], [], set()
+    for candidate_id, pool, length in parsed:
+        if candidate_id in already_scheduled or candidate_id in seen:
+            unassigned.append(candidate_id)
+            continue
+        seen.add(candidate_id)
+        requests.append(SchedulingRequest(
+            candidate_id, candidates_masks.get(candidate_id, EMPTY), pool, length))
+
+    scheduler = BatchScheduler(employees_masks)
+    assignments, failed = scheduler.schedule(requests)
+    unassigned.extend(request.candidate for request in failed)
+
+    # cached free masks could miss interviews just booked by another process
+    booked = booked_masks(employees_ids, week)
+    for assignment in list(assignments):
+        window = span(assignment.start, assignment.length)
+        if booked.get(assignment.employee, EMPTY) & window:
+            assignments.remove(assignment)
+            unassigned.append(assignment.candidate)
+
+    db.session.bulk_insert_mappings(Interview, [
+        {'employee_id': assignment.employee,
+         'candidate_id': assignment.candidate,
+         'start_id': assignment.start,
+         'week': week,
+         'duration_in_timeslots': assignment.length}
+        for assignment in assignments])
+    register_bookings(db.session, [
+        (assignment.employee, week, assignment.start, assignment.length)
+        for assignment in assignments])
+    db.session.commit()
+
+    interviews = []
+    for assignment in sorted(assignments, key=lambda a: (a.start, a.employee)):
+        record = _schedule_record(assignment.start)
+        record['candidate'] = assignment.candidate
+        record['employee'] = assignment.employee
+        record['duration_in_timeslots'] = assignment.length
+        interviews.append(record)
+
+    return success({'week': week.isoformat(),
+                    'interviews': interviews,
+                    'unassigned': unassigned})
 
 
 @main.route('/api/v1/interview', methods=['GET', 'POST', 'DELETE'])
 def interview_endpoint():
-    return api_bad_request('not implemented')
+    """
+    Books interviews and cancels them.
+
+    GET and DELETE parameters:
+        * id (int): An ID of interview.
+
+    DELETE-specific parameters:
+        * version (int, optional): The version of interview known to client. If the
+            interview was changed since then, it is not deleted.
+
+    POST parameters:
+        * candidate (int): An ID of interviewed candidate.
+        * employee (int): An ID of employee carrying out the interview.
+        * day (str): An interview day.
+        * time (str): Interview start in format 'hh:mm', converted to the closest
+            discrete timeslot.
+        * duration (int, optional): Interview duration in minutes. Defaults to
+            a single timeslot.
+        * week (str, optional): Any date of the interview week formatted as
+            'YYYY-MM-DD'. Defaults to the next week.
+
+    Booking is atomic: the rows of employee and candidate are locked until the
+    interview is committed, so concurrent requests for any of them are processed
+    one by one. A request conflicting with the current state (e.g. overlapping
+    an existing interview of employee) gets 409 response.
+
+    """
+    if request.method == 'POST':
+        return _book_interview()
+
+    ok, result = _get_json_keys('id')
+    if not ok:
+        return result.error
+
+    interview_id = result.payload['id']
+    interview = entity_with_id(Interview, interview_id)
+    if interview is None:
+        return api_bad_request('interview with ID=%d is not found' % interview_id)
+
+    if request.method == 'GET':
+        return success(_interview_record(interview))
+
+    elif request.method == 'DELETE':
+        if request.json.get('version', interview.version) != interview.version:
+            return api_conflict('interview was changed, its version is %d' %
+                                interview.version)
+        db.session.delete(interview)
+        try:
+            db.session.commit()
+        except StaleDataError:
+            db.session.rollback()
+            return api_conflict('interview was changed or deleted concurrently')
+        return success({'id': interview_id})
 
 
 class TimeAllocationRequest:
     """
-    Helper class to parse time allocation request parameters and return new or existing
-    timeslot object to be included into person's availability list.
+    Helper class to parse time allocation request parameters into the set of indices
+    of timeslots to be included into person's availability list.
     """
 
-    def __init__(self, request_obj, expected_keys, time_regex='^(\d\d)?:(\d\d)?$'):
+    def __init__(self, request_obj, person_key, time_regex=r'^(\d\d?):(\d\d)$'):
         self.request_obj = request_obj
-        self.expected_keys = expected_keys
+        self.person_key = person_key
         self.time_regex = time_regex
         self._error = None
-        self._params = None
+        self._indices = None
         self._parsed = None
 
     @property
     def error(self):
         return self._error
 
+    @property
+    def indices(self):
+        return self._indices
+
     def parsed(self, value):
         if value not in self._parsed:
             raise KeyError('unknown request parameter: %s' % value)
         return self._parsed[value]
 
     def validate(self):
-        ok, result = _get_json_keys(*self.expected_keys)
-
+        ok, result = _get_json_keys(self.person_key)
         if not ok:
             self._error = result.error
             return False
 
-        person_id, day, time = _unwrap(self.expected_keys, result.payload)
+        if 'slots' in self.request_obj.json:
+            entries = self.request_obj.json['slots']
+            if not isinstance(entries, list):
+                self._error = api_bad_request('slots should be a list')
+                return False
+        else:
+            ok, single = _get_json_keys('day', 'time')
+            if not ok:
+                self._error = single.error
+                return False
+            entries = [single.payload]
+
+        indices = set()
+        for entry in entries:
+            entry_indices = self._parse_entry(entry)
+            if entry_indices is None:
+                return False
+            indices.update(entry_indices)
+
+        self._indices = indices
+        self._parsed = result.payload
+        return True
+
+    def _parse_entry(self, entry):
+        if not isinstance(entry, dict) or 'day' not in entry:
+            self._error = api_bad_request('each slot should include day')
+            return None
 
+        day = entry['day']
         if day not in days_of_week:
             self._error = api_bad_request('invalid day of weeK: %s' % day)
-            return False
-
-        match = re.match(self.time_regex, time)
+            return None
+
+        if 'time' in entry:
+            first = self._parse_time(entry['time'])
+            if first is None:
+                return None
+            return [slot_index(day, *first)]
+
+        if 'from' not in entry or 'to' not in entry:
+            self._error = api_bad_request('each slot should include time or from/to')
+            return None
+
+        first = self._parse_time(entry['from'])
+        last = self._parse_time(entry['to'], end=True)
+        if first is None or last is None:
+            return None
+        start, end = slot_index(day, *first), slot_index(day, *last)
+        if end <= start:
+            self._error = api_bad_request(
+                'slot should end after it starts: %s-%s' % (entry['from'], entry['to']))
+            return None
+        return range(start, end)
+
+    def _parse_time(self, time, end=False):
+        """Parses HH:MM time, the end of a range can also be the end of day (24:00)."""
+
+        match = re.match(self.time_regex, str(time))
         if match is None:
             self._error = api_bad_request('invalid time format')
-            return False
+            return None
 
         hour, minute = [int(x) for x in match.groups()]
-        if not (0 <= hour < 23) or not (0 <= minute <= 59):
+        if end and (hour, minute) == (24, 0):
+            return hour, minute
+        if not (0 <= hour <= 23) or not (0 <= minute <= 59):
             self._error = api_bad_request('time out of range')
-            return False
+            return None
 
-        minute_rounded = TIMESLOT_DURATION * (minute // TIMESLOT_DURATION)
-        params = dict(day=day, hour=str(hour), minute=str(minute_rounded))
-        self._params = params
-        self._parsed = result.payload
-        return True
-
-    def create_or_query_timeslot(self):
-        timeslot = Timeslot.query.filter_by(**self._params).first()
-        if timeslot is None:
-            timeslot = Timeslot(**self._params)
-            db.session.add(timeslot)
-            db.session.commit()
-        return timeslot
+        return hour, TIMESLOT_DURATION * (minute // TIMESLOT_DURATION)
 
 
 def success(data=None):
@@ -314,6 +702,12 @@ def api_forbidden(message):
     return response
 
 
+def api_conflict(message):
+    response = error('conflict', message)
+    response.status_code = 409
+    return response
+
+
 def api_resource_not_found(message):
     response = error('resource not found', message)
     response.status_code = 404
@@ -375,13 +769,429 @@ def _unwrap(keys, dictionary, default=None):
     return [dictionary.get(key, default) for key in keys]
 
 
-def _create_availability_response(person):
+def _requested_week():
+    """
+    Returns the Monday of the week from request's `week` parameter, or the next
+    week if the parameter is missing. Returns None if the week is invalid.
+    """
+    value = request.json.get('week')
+    if value is None:
+        return next_week()
+    return parse_week(value, current_app.config['SCHEDULING_HORIZON_WEEKS'])
+
+
+def _common_masks_sql(candidate_id, employees_ids, week):
+    """
+    Finds timeslots shared by candidate and each of employees intersecting the
+    intervals of their templates and week allocations in the database. The week
+    exceptions of both sides and employees' interviews are removed from the
+    intersections afterwards.
+    """
+    employee = _week_intervals(EmployeeAvailability, EmployeeTemplate,
+                               'employee_id', employees_ids, week)
+    candidate = _week_intervals(CandidateAvailability, CandidateTemplate,
+                                'candidate_id', [candidate_id], week)
+    overlap = (func.int4range(employee.c.start_slot, employee.c.end_slot)
+               .op('&&')(func.int4range(candidate.c.start_slot, candidate.c.end_slot)))
+    rows = (db.session.query(employee.c.person_id,
+                             func.greatest(employee.c.start_slot, candidate.c.start_slot),
+                             func.least(employee.c.end_slot, candidate.c.end_slot))
+            .join(candidate, overlap))
+    masks = {}
+    for employee_id, start, end in rows:
+        masks[employee_id] = masks.get(employee_id, EMPTY) | span(start, end - start)
+
+    employees_excluded, candidate_excluded = _excluded_masks(
+        employees_ids, candidate_id, week)
+    for employee_id, mask in masks.items():
+        excluded = candidate_excluded | employees_excluded.get(employee_id, EMPTY)
+        masks[employee_id] = apply_diff(mask, EMPTY, excluded)
+    return masks
+
+
+def _week_intervals(allocations, template, person_key, person_ids, week):
+    """Returns subquery of template and week allocations intervals of persons."""
+
+    def intervals(model, *criteria):
+        person_column = getattr(model, person_key)
+        return (db.select([person_column.label('person_id'),
+                           model.start_slot,
+                           model.end_slot])
+                .where(person_column.in_(person_ids))
+                .where(*criteria))
+
+    return union_all(intervals(template),
+                     intervals(allocations, allocations.week == week)).subquery()
+
+
+def _excluded_masks(employees_ids, candidate_id, week):
+    """
+    Returns the week exceptions and interviews of employees keyed by employee's ID
+    and the week exceptions of candidate loaded with a single query.
+    """
+    employee, candidate = EmployeeException, CandidateException
+    query = union_all(
+        db.select([employee.employee_id.label('person_id'),
+                   literal(False).label('is_candidate'),
+                   employee.start_slot, employee.end_slot])
+        .where(employee.week == week)
+        .where(employee.employee_id.in_(employees_ids)),
+        db.select([Interview.employee_id, literal(False), Interview.start_id,
+                   Interview.start_id + Interview.duration_in_timeslots])
+        .where(Interview.week == week)
+        .where(Interview.employee_id.in_(employees_ids)),
+        db.select([candidate.candidate_id, literal(True),
+                   candidate.start_slot, candidate.end_slot])
+        .where(candidate.week == week)
+        .where(candidate.candidate_id == candidate_id))
+    employees_masks, candidate_mask = {}, EMPTY
+    for person_id, is_candidate, start, end in db.session.execute(query):
+        if is_candidate:
+            candidate_mask |= span(start, end - start)
+        else:
+            employees_masks[person_id] = (
+                employees_masks.get(person_id, EMPTY) | span(start, end - start))
+    return employees_masks, candidate_mask
+
+
+def _allocate_time(entity_cls, person_key):
+    """
+    Adds timeslots from time allocation request into person's availability for
+    the week, or excludes them from it.
+
+    Allocated timeslots are removed from the week exceptions and vice versa, so
+    the latest request always wins over the person's template. Only the person's
+    intervals of the week are read, and they are written back with a single
+    statement, so the cost of request doesn't depend on person's other weeks.
+    """
+    req = TimeAllocationRequest(request, person_key)
+    if not req.validate():
+        return req.error
+
+    week = _requested_week()
+    if week is None:
+        return api_bad_request(WEEK_ERROR)
+
+    available = request.json.get('available', True)
+    if not isinstance(available, bool):
+        return api_bad_request('available should be a boolean')
+
+    encoding = _response_encoding()
+    if encoding is None:
+        return api_bad_request('unknown encoding')
+
+    # the lock serializes concurrent allocations of the same person
+    person_id = req.parsed(person_key)
+    person = (entity_cls.query
+              .filter(entity_cls.id == person_id)
+              .with_for_update()
+              .one_or_none())
+    if person is None:
+        return api_bad_request('%s ID=%d does not exist' % (
+            entity_cls.__name__.lower(), person_id))
+
+    indices_mask = to_mask(req.indices)
+    template, allocated, exceptions = week_diff(entity_cls, person_id, week)
+    if available:
+        allocated, exceptions = allocated | indices_mask, exceptions & ~indices_mask
+    else:
+        allocated, exceptions = allocated & ~indices_mask, exceptions | indices_mask
+
+    mask = apply_diff(template, allocated, exceptions)
+    write_week(entity_cls, person_id, week, allocated, exceptions)
+    db.session.commit()
+    store_mask(entity_cls, person_id, week, mask)
+    return _create_availability_response(person, week, mask, encoding)
+
+
+def _manage_template(entity_cls, template_cls, person_key):
+    if request.method == 'POST':
+        req = TimeAllocationRequest(request, person_key)
+        if not req.validate():
+            return req.error
+        person_id = req.parsed(person_key)
+    else:
+        ok, result = _get_json_keys(person_key)
+        if not ok:
+            return result.error
+        person_id = result.payload[person_key]
+
+    person = entity_with_id(entity_cls, person_id)
+    if person is None:
+        return api_bad_request('%s ID=%d does not exist' % (
+            entity_cls.__name__.lower(), person_id))
+
+    encoding = _response_encoding()
+    if encoding is None:
+        return api_bad_request('unknown encoding')
+
+    if request.method == 'GET':
+        return _create_availability_response(person, None, person.template_mask, encoding)
+
+    mask = to_mask(req.indices) if request.method == 'POST' else EMPTY
+    person.template = template_cls.from_mask(mask)
+    db.session.commit()
+    return _create_availability_response(person, None, mask, encoding)
+
+
+def _list_persons(entity_cls, interview_column, collection):
+    args = request.args
+    try:
+        limit = int(args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        limit = 0
+    if not 0 < limit <= MAX_PAGE_SIZE:
+        return api_bad_request('limit should be between 1 and %d' % MAX_PAGE_SIZE)
+
+    allowed = LISTED_FIELDS[entity_cls]
+    fields = args.get('fields')
+    fields = allowed if fields is None else fields.split(',')
+    unknown = set(fields) - set(allowed)
+    if unknown:
+        return api_bad_request('unknown field: %s' % min(unknown))
+
+    order = entity_cls.last_name, entity_cls.first_name, entity_cls.id
+    query = db.session.query(*[getattr(entity_cls, name) for name in allowed])
+
+    if 'after' in args:
+        after = _decode_cursor(args['after'])
+        if after is None:
+            return api_bad_request('invalid cursor')
+        query = query.filter(tuple_(*order) > tuple_(*after))
+
+    if 'prefix' in args:
+        prefix = re.sub(r'([\\%_])', r'\\\1', args['prefix'])
+        query = query.filter(entity_cls.last_name.like(prefix + '%'))
+
+    filters = {'has_availability': _has_availability(entity_cls),
+               'has_interview': exists().where(interview_column == entity_cls.id)}
+    for name, condition in filters.items():
+        if name not in args:
+            continue
+        value = args[name].lower()
+        if value not in ('true', 'false', '1', '0'):
+            return api_bad_request('%s should be a boolean' % name)
+        query = query.filter(condition if value in ('true', '1') else ~condition)
+
+    rows = query.order_by(*order).limit(limit + 1).all()
+    has_next = len(rows) > limit
+    rows = rows[:limit]
+
+    records = [{name: getattr(row, name) for name in fields} for row in rows]
+    cursor = None
+    if has_next:
+        last = rows[-1]
+        cursor = _encode_cursor([last.last_name, last.first_name, last.id])
+    return success({collection: records, 'next': cursor})
+
+
+def _has_availability(entity_cls):
+    person_key, allocations, template, _ = SOURCES[entity_cls]
+    return or_(
+        exists().where(getattr(template, person_key) == entity_cls.id),
+        exists().where(getattr(allocations, person_key) == entity_cls.id)
+                .where(allocations.week >= current_week()))
+
+
+def _encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def _decode_cursor(cursor):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        return None
+    if not isinstance(values, list) or list(map(type, values)) != [str, str, int]:
+        return None
+    return values
+
+
+def _book_interview():
+    keys = 'candidate', 'employee'
+    ok, result = _get_json_keys(*keys)
+    if not ok:
+        return result.error
+
+    candidate_id, employee_id = _unwrap(keys, result.payload)
+    req = TimeAllocationRequest(request, 'candidate')
+    if not req.validate():
+        return req.error
+    if len(req.indices) != 1:
+        return api_bad_request('interview should have a single start timeslot')
+
+    start = req.indices.pop()
+    length = duration_in_timeslots(request.json.get('duration', TIMESLOT_DURATION))
+    if length is None:
+        return api_bad_request('duration should be a positive number of minutes')
+    if start + length > SLOTS_PER_WEEK:
+        return api_bad_request('interview should end within the week')
+
+    week = _requested_week()
+    if week is None:
+        return api_bad_request(WEEK_ERROR)
+
+    employees, candidates = _lock_persons([employee_id], [candidate_id])
+    conflict = None
+    if employee_id not in employees:
+        conflict = api_bad_request('employee with ID=%d is not found' % employee_id)
+    elif candidate_id not in candidates:
+        conflict = api_bad_request('candidate with ID=%d is not found' % candidate_id)
+    else:
+        conflict = _booking_conflict(employee_id, candidate_id, week, start, length)
+    if conflict is not None:
+        db.session.rollback()
+        return conflict
+
+    interview = Interview(employee_id=employee_id,
+                          candidate_id=candidate_id,
+                          week=week,
+                          start_id=start,
+                          duration_in_timeslots=length)
+    db.session.add(interview)
+    db.session.commit()
+    return success({'id': interview.id, 'version': interview.version})
+
+
+def _booking_conflict(employee_id, candidate_id, week, start, length):
+    """
+    Returns 409 response if the interview cannot be booked. Expected to be called
+    with employee's and candidate's rows locked.
+    """
+    window = span(start, length)
+    available = (availability_masks(Employee, [employee_id], week)[employee_id] &
+                 availability_masks(Candidate, [candidate_id], week)[candidate_id])
+    if window & ~available:
+        return api_conflict('employee or candidate is not available at this time')
+
+    if Interview.query.filter_by(candidate_id=candidate_id).first() is not None:
+        return api_conflict('candidate already has an interview')
+
+    if booked_masks([employee_id], week).get(employee_id, EMPTY) & window:
+        return api_conflict('employee already has an interview at this time')
+
+    return None
+
+
+def _lock_persons(employees_ids, candidates_ids):
+    """
+    Locks rows of employees and then rows of candidates in the order of their IDs
+    until the end of transaction. As all bookings acquire locks in the same order,
+    concurrent bookings never deadlock. Returns the sets of locked IDs.
+    """
+    def lock(entity_cls, ids):
+        return {entity_id for entity_id, in db.session.query(entity_cls.id)
+                .filter(entity_cls.id.in_(ids))
+                .order_by(entity_cls.id)
+                .with_for_update()}
+
+    return lock(Employee, employees_ids), lock(Candidate, candidates_ids)
+
+
+def _interview_record(interview):
+    day, hour, minute = slot_parts(interview.start_id)
+    return {
+        'id': interview.id,
+        'employee': interview.employee_id,
+        'candidate': interview.candidate_id,
+        'week': interview.week.isoformat(),
+        'start': {'day': day, 'hour': hour, 'minute': minute},
+        'start_verbose': interview.verbose_start,
+        'duration_in_minutes': interview.duration_in_minutes,
+        'duration_verbose': interview.verbose_duration,
+        'version': interview.version}
+
+
+def _iter_schedule(mode, starts, required, encoding='verbose'):
+    """
+    Yields schedule records from the masks of possible interview starts computed
+    for each employee.
+    """
+    if encoding != 'verbose':
+        yield from _iter_compact_schedule(mode, starts, required, encoding)
+        return
+
+    if mode == 'each':
+        for employee, starts_mask in starts.items():
+            for index in iter_indices(starts_mask):
+                record = _schedule_record(index)
+                record['interviewer'] = employee.name
+                yield record
+        return
+
+    for index in iter_indices(panel_starts(mode, starts, required)):
+        record = _schedule_record(index)
+        record['interviewers'] = [
+            employee.name for employee in panel_members(starts, index)]
+        yield record
+
+
+def _iter_compact_schedule(mode, starts, required, encoding):
+    """
+    Yields a record per interviewer (or per group of interviewers free at the same
+    timeslots in panel modes) with all of their timeslots encoded at once.
+    """
+    encode = SLOTS_ENCODERS[encoding]
+
+    if mode == 'each':
+        for employee, starts_mask in starts.items():
+            if starts_mask:
+                yield {'interviewer': employee.name, 'slots': encode(starts_mask)}
+        return
+
+    groups = panel_groups(starts, panel_starts(mode, starts, required))
+    for members, mask in groups.items():
+        yield {'interviewers': [employee.name for employee in members],
+               'slots': encode(mask)}
+
+
+def _response_encoding():
+    """
+    Returns the encoding of timeslots requested by client or None if it is unknown.
+
+    The encoding is taken from `encoding` query parameter or from one of vendor
+    media types listed in Accept header, and is one of:
+        * 'verbose' (default): a timeslot is an object with day, hour and minute;
+        * 'indices': timeslots are a list of their indices within the week, i.e.
+            numbers from 0 (Monday 00:00) to 671 (Sunday 23:45);
+        * 'mask': timeslots are a base64 encoded bit mask of 84 bytes, where the
+            timeslot N is the bit N % 8 of the byte N // 8.
+    """
+    encoding = request.args.get('encoding')
+    if encoding is None:
+        mimetype = request.accept_mimetypes.best_match(
+            ['application/json'] + list(ENCODING_MIMETYPES))
+        encoding = ENCODING_MIMETYPES.get(mimetype, 'verbose')
+    if encoding not in SLOTS_ENCODERS:
+        return None
+    return encoding
+
+
+def _accepts_ndjson():
+    best = request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE])
+    return best == NDJSON_MIMETYPE
+
+
+def _ndjson_response(records):
+    lines = (json.dumps(record) + '\n' for record in records)
+    return Response(stream_with_context(lines), mimetype=NDJSON_MIMETYPE)
+
+
+def _schedule_record(index):
+    day, hour, minute = slot_parts(index)
+    return {'day': day, 'hour': hour, 'minute': minute}
+
+
+def _create_availability_response(person, week, mask, encoding='verbose'):
+    if encoding == 'verbose':
+        timeslots = [_schedule_record(index) for index in iter_indices(mask)]
+    else:
+        timeslots = SLOTS_ENCODERS[encoding](mask)
     result = {
          'id': person.id,
          'person': person.full_name,
-         'timeslots': [
-            {'day': ts.day,
-             'hour': int(ts.hour),
-             'minute': int(ts.minute)}
-            for ts in person.availability]}
+         'encoding': encoding,
+         'timeslots': timeslots}
+    if week is not None:
+        result['week'] = week.isoformat()
     return success(result)
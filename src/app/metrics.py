@@ -0,0 +1,206 @@
+"""
+Request latency and SQL instrumentation exposed in Prometheus text format.
+
+Every request handled by the app is timed and the SQL statements it executes are
+counted and timed with engine events. Durations are aggregated per route into
+histograms with fixed buckets, so p50/p95/p99 latencies are computed by the
+scraper (e.g. with `histogram_quantile`) and the metrics of several worker
+processes can be summed. Every request gets an ID (taken from `X-Request-ID`
+header if present) attached to its log records, and is logged to 'requests'
+logger with its duration. The requests slower than `SLOW_REQUEST_SECONDS` are
+also logged together with the list of their statements.
+"""
+import threading
+from bisect import bisect_left
+from time import perf_counter
+from uuid import uuid4
+
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from config import get_logger
+
+
+PREFIX = 'lanxess'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+STATEMENTS_BUCKETS = (1, 2, 3, 5, 10, 25, 50, 100)
+UNMATCHED_ROUTE = '<unmatched>'
+REQUEST_ID_HEADER = 'X-Request-ID'
+
+
+class Histogram:
+    """Cumulative histogram of observed values with fixed upper bounds."""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """Yields `(upper bound, number of values not exceeding it)` pairs."""
+
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            yield bound, total
+        yield float('inf'), self.count
+
+
+class RequestMetrics:
+    """
+    Collects per-route request durations, SQL statements counts and durations
+    and the number of responses by status code.
+    """
+
+    def __init__(self):
+        self.slow_request_seconds = None
+        self._durations = {}
+        self._statements = {}
+        self._sql_durations = {}
+        self._responses = {}
+        self._lock = threading.Lock()
+        self._logger = self._requests_logger = None
+
+    def init_app(self, app):
+        self.slow_request_seconds = app.config['SLOW_REQUEST_SECONDS']
+        self._logger = app.custom_logger
+        self._requests_logger = get_logger('requests')
+        app.before_request(_start_request)
+        app.after_request(self._finish_request)
+        app.teardown_request(_discard_request)
+
+    def observe(self, route, method, status, duration, queries):
+        key = route, method
+        sql_duration = sum(elapsed for _, elapsed in queries)
+        with self._lock:
+            _histogram(self._durations, key, DURATION_BUCKETS).observe(duration)
+            _histogram(self._statements, key, STATEMENTS_BUCKETS).observe(len(queries))
+            _histogram(self._sql_durations, key, DURATION_BUCKETS).observe(sql_duration)
+            status_key = route, method, str(status)
+            self._responses[status_key] = self._responses.get(status_key, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            for metrics in (self._durations, self._statements,
+                            self._sql_durations, self._responses):
+                metrics.clear()
+
+    def render(self):
+        """Returns collected metrics in Prometheus text exposition format."""
+
+        lines = []
+        with self._lock:
+            _render_counter(lines, 'http_responses_total',
+                            'Responses by route, method and status code.',
+                            self._responses)
+            _render_histograms(lines, 'http_request_duration_seconds',
+                               'Request duration by route.', self._durations)
+            _render_histograms(lines, 'http_request_sql_statements',
+                               'SQL statements executed per request by route.',
+                               self._statements)
+            _render_histograms(lines, 'http_request_sql_duration_seconds',
+                               'Time spent in SQL statements per request by route.',
+                               self._sql_durations)
+        return '\n'.join(lines) + '\n'
+
+    def _finish_request(self, response):
+        started = g.pop('metrics_started', None)
+        queries = g.pop('metrics_queries', None)
+        if started is None:
+            return response
+        duration = perf_counter() - started
+        route = request.url_rule.rule if request.url_rule else UNMATCHED_ROUTE
+        self.observe(route, request.method, response.status_code, duration, queries)
+        response.headers[REQUEST_ID_HEADER] = g.request_id
+        self._requests_logger.info('%s %s %d', request.method, route,
+                                   response.status_code,
+                                   extra={'duration': round(duration, 6)})
+        if duration >= self.slow_request_seconds:
+            self._log_slow_request(route, duration, queries)
+        return response
+
+    def _log_slow_request(self, route, duration, queries):
+        self._logger.warning('Slow request %s %s took %.3fs with %d SQL statements',
+                             request.method, route, duration, len(queries))
+        for statement, elapsed in queries:
+            self._logger.warning('  %.3fs %s', elapsed, ' '.join(statement.split()))
+
+
+request_metrics = RequestMetrics()
+
+
+def _start_request():
+    g.request_id = request.headers.get(REQUEST_ID_HEADER) or uuid4().hex
+    g.metrics_queries = []
+    g.metrics_started = perf_counter()
+
+
+def _discard_request(exc):
+    g.pop('request_id', None)
+    g.pop('metrics_started', None)
+    g.pop('metrics_queries', None)
+
+
+def _histogram(histograms, key, buckets):
+    histogram = histograms.get(key)
+    if histogram is None:
+        histogram = histograms[key] = Histogram(buckets)
+    return histogram
+
+
+def _labels(**labels):
+    pairs = ('%s="%s"' % (name, _escape(value)) for name, value in labels.items())
+    return '{%s}' % ','.join(pairs)
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _render_counter(lines, name, description, counters):
+    name = f'{PREFIX}_{name}'
+    lines.append(f'# HELP {name} {description}')
+    lines.append(f'# TYPE {name} counter')
+    for (route, method, status), value in sorted(counters.items()):
+        lines.append('%s%s %d' % (
+            name, _labels(route=route, method=method, status=status), value))
+
+
+def _render_histograms(lines, name, description, histograms):
+    name = f'{PREFIX}_{name}'
+    lines.append(f'# HELP {name} {description}')
+    lines.append(f'# TYPE {name} histogram')
+    for (route, method), histogram in sorted(histograms.items()):
+        for bound, count in histogram.cumulative():
+            le = '+Inf' if bound == float('inf') else repr(float(bound))
+            lines.append('%s_bucket%s %d' % (
+                name, _labels(route=route, method=method, le=le), count))
+        labels = _labels(route=route, method=method)
+        lines.append('%s_sum%s %r' % (name, labels, float(histogram.sum)))
+        lines.append('%s_count%s %d' % (name, labels, histogram.count))
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_statement(conn, cursor, statement, parameters, context, executemany):
+    conn.info['metrics_started'] = perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _finish_statement(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        queries = g.get('metrics_queries')
+        if queries is not None:
+            started = conn.info['metrics_started']
+            queries.append((statement, perf_counter() - started))
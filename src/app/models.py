@@ -1,40 +1,52 @@
-from calendar import day_name
-
-from sqlalchemy.dialects.postgresql import ENUM
+from sqlalchemy.dialects.postgresql import insert
 
 from . import db
+from scheduling.slots import TIMESLOT_DURATION, MINUTES_PER_HOUR, SLOTS_PER_WEEK
+from scheduling.slots import slot_parts, to_intervals, from_intervals, apply_diff
+from .weeks import slot_datetime
 
 
-TIMESLOT_DURATION = 15
-MINUTES_PER_HOUR = 60
-
-days_of_week = tuple(day_name)
-hours = [str(x) for x in range(24)]
-minutes_granularity = [str(x) for x in range(0, 60, TIMESLOT_DURATION)]
-
-days_of_week_enum = ENUM(*days_of_week, name='days_of_week')
-hours_enum = ENUM(*hours, name='hours')
-minutes_enum = ENUM(*minutes_granularity, name='minutes')
+class PersonMixin:
+    """Common computed properties and methods for employees and candidates."""
 
+    @property
+    def full_name(self):
+        return f'{self.first_name} {self.last_name}'
 
-employee_timeslots = db.Table(
-    'employee_timeslots',
-    db.Column('employee_id', db.Integer, db.ForeignKey('employees.id')),
-    db.Column('timeslots_id', db.Integer, db.ForeignKey('timeslots.id')))
+    @property
+    def template_mask(self):
+        return _intervals_mask(self.template)
 
+    def allocated_mask(self, week):
+        return _intervals_mask(self.availability, week)
 
-candidate_timeslots = db.Table(
-    'candidate_timeslots',
-    db.Column('candidate_id', db.Integer, db.ForeignKey('candidates.id')),
-    db.Column('timeslots_id', db.Integer, db.ForeignKey('timeslots.id')))
+    def exceptions_mask(self, week):
+        return _intervals_mask(self.exceptions, week)
 
+    def availability_mask(self, week):
+        """Returns the template expanded into the week with its overrides applied."""
 
-class PersonMixin:
-    """Common computed properties and methods for employees and candidates."""
+        return apply_diff(self.template_mask,
+                          self.allocated_mask(week),
+                          self.exceptions_mask(week))
 
-    @property
-    def full_name(self):
-        return f'{self.first_name} {self.last_name}'
+    @classmethod
+    def insert_or_get(cls, **fields):
+        """
+        Creates a person unless the one with the same name already exists, with
+        a single statement. Returns person's ID and a flag telling if it was
+        created.
+        """
+        table = cls.__table__
+        statement = insert(table).values(**fields)
+        statement = (statement
+                     .on_conflict_do_update(
+                         constraint=f'uq_{table.name}_name',
+                         set_={'first_name': statement.excluded.first_name})
+                     .returning(table.c.id, db.literal_column('xmax = 0')))
+        person_id, created = db.session.execute(statement).first()
+        db.session.commit()
+        return person_id, created
 
     @classmethod
     def exists(cls, first_name, last_name):
@@ -43,14 +55,153 @@ class PersonMixin:
         return employee is not None
 
 
+class IntervalMixin:
+    """
+    Interval of consecutive timeslots `[start_slot, end_slot)`. Person's intervals
+    of the same kind (and week) never overlap or touch each other.
+    """
+
+    start_slot = db.Column(db.SmallInteger, nullable=False)
+    end_slot = db.Column(db.SmallInteger, nullable=False)
+
+    @classmethod
+    def from_mask(cls, mask, **fields):
+        return [cls(start_slot=start, end_slot=end, **fields)
+                for start, end in to_intervals(mask)]
+
+
+class AvailabilityMixin(IntervalMixin):
+    """Interval of timeslots of a week when a person is available."""
+
+    week = db.Column(db.Date, nullable=False)
+
+
+class TemplateMixin(IntervalMixin):
+    """Interval of timeslots when a person is available every week."""
+
+
+class ExceptionMixin(IntervalMixin):
+    """Interval of timeslots of a week when a person is not available anyway."""
+
+    week = db.Column(db.Date, nullable=False)
+
+
+def _intervals_mask(intervals, week=None):
+    return from_intervals(
+        (interval.start_slot, interval.end_slot)
+        for interval in intervals if week is None or interval.week == week)
+
+
+def _interval_table_args(table, *key):
+    return (
+        db.PrimaryKeyConstraint(*key, 'start_slot', name=f'{table}_pkey'),
+        db.CheckConstraint(
+            f'start_slot >= 0 AND start_slot < end_slot AND end_slot <= {SLOTS_PER_WEEK}',
+            name=f'ck_{table}_slots'))
+
+
+def _availability_table_args(table, person_column):
+    return _interval_table_args(table, person_column, 'week') + (
+        db.Index(f'ix_{table}_slots',
+                 db.text('int4range(start_slot, end_slot)'),
+                 postgresql_using='gist'),
+        {'postgresql_partition_by': 'RANGE (week)'})
+
+
+class EmployeeAvailability(AvailabilityMixin, db.Model):
+    """Interval of timeslots when employee is available for interviews."""
+
+    __tablename__ = 'employee_availability'
+    __table_args__ = _availability_table_args(__tablename__, 'employee_id')
+    employee_id = db.Column(
+        db.Integer,
+        db.ForeignKey('employees.id', ondelete='CASCADE'),
+        nullable=False)
+
+
+class CandidateAvailability(AvailabilityMixin, db.Model):
+    """Interval of timeslots when candidate is available for interview."""
+
+    __tablename__ = 'candidate_availability'
+    __table_args__ = _availability_table_args(__tablename__, 'candidate_id')
+    candidate_id = db.Column(
+        db.Integer,
+        db.ForeignKey('candidates.id', ondelete='CASCADE'),
+        nullable=False)
+
+
+class EmployeeTemplate(TemplateMixin, db.Model):
+    """Interval of timeslots when employee is available every week."""
+
+    __tablename__ = 'employee_templates'
+    __table_args__ = _interval_table_args(__tablename__, 'employee_id')
+    employee_id = db.Column(
+        db.Integer,
+        db.ForeignKey('employees.id', ondelete='CASCADE'),
+        nullable=False)
+
+
+class CandidateTemplate(TemplateMixin, db.Model):
+    """Interval of timeslots when candidate is available every week."""
+
+    __tablename__ = 'candidate_templates'
+    __table_args__ = _interval_table_args(__tablename__, 'candidate_id')
+    candidate_id = db.Column(
+        db.Integer,
+        db.ForeignKey('candidates.id', ondelete='CASCADE'),
+        nullable=False)
+
+
+class EmployeeException(ExceptionMixin, db.Model):
+    """Interval of timeslots of a week excluded from employee's template."""
+
+    __tablename__ = 'employee_exceptions'
+    __table_args__ = _interval_table_args(__tablename__, 'employee_id', 'week')
+    employee_id = db.Column(
+        db.Integer,
+        db.ForeignKey('employees.id', ondelete='CASCADE'),
+        nullable=False)
+
+
+class CandidateException(ExceptionMixin, db.Model):
+    """Interval of timeslots of a week excluded from candidate's template."""
+
+    __tablename__ = 'candidate_exceptions'
+    __table_args__ = _interval_table_args(__tablename__, 'candidate_id', 'week')
+    candidate_id = db.Column(
+        db.Integer,
+        db.ForeignKey('candidates.id', ondelete='CASCADE'),
+        nullable=False)
+
+
+def _person_table_args(table):
+    return (
+        db.UniqueConstraint('last_name', 'first_name', name=f'uq_{table}_name'),
+        db.Index(f'ix_{table}_last_name_pattern',
+                 'last_name',
+                 postgresql_ops={'last_name': 'text_pattern_ops'}))
+
+
 class Employee(PersonMixin, db.Model):
     """Company's employee responsible for carrying out interviews."""
 
     __tablename__ = 'employees'
+    __table_args__ = _person_table_args(__tablename__)
     id = db.Column(db.Integer, primary_key=True)
     first_name = db.Column(db.String(32), nullable=False)
     last_name = db.Column(db.String(64), nullable=False)
-    availability = db.relationship('Timeslot', secondary=employee_timeslots)
+    availability = db.relationship('EmployeeAvailability',
+                                   cascade='all, delete-orphan',
+                                   passive_deletes=True,
+                                   order_by='EmployeeAvailability.start_slot')
+    template = db.relationship('EmployeeTemplate',
+                               cascade='all, delete-orphan',
+                               passive_deletes=True,
+                               order_by='EmployeeTemplate.start_slot')
+    exceptions = db.relationship('EmployeeException',
+                                 cascade='all, delete-orphan',
+                                 passive_deletes=True,
+                                 order_by='EmployeeException.start_slot')
     interviews = db.relationship('Interview',
                                  uselist=True,
                                  backref='employee',
@@ -61,12 +212,24 @@ class Candidate(PersonMixin, db.Model):
     """Interviewed candidate."""
 
     __tablename__ = 'candidates'
+    __table_args__ = _person_table_args(__tablename__)
     id = db.Column(db.Integer, primary_key=True)
     first_name = db.Column(db.String(32), nullable=False)
     last_name = db.Column(db.String(64), nullable=False)
     skype = db.Column(db.String(64), default=None)
     email = db.Column(db.String(254), nullable=False)
-    availability = db.relationship('Timeslot', secondary=candidate_timeslots)
+    availability = db.relationship('CandidateAvailability',
+                                   cascade='all, delete-orphan',
+                                   passive_deletes=True,
+                                   order_by='CandidateAvailability.start_slot')
+    template = db.relationship('CandidateTemplate',
+                               cascade='all, delete-orphan',
+                               passive_deletes=True,
+                               order_by='CandidateTemplate.start_slot')
+    exceptions = db.relationship('CandidateException',
+                                 cascade='all, delete-orphan',
+                                 passive_deletes=True,
+                                 order_by='CandidateException.start_slot')
     interview = db.relationship('Interview',
                                 uselist=False,
                                 backref='candidate',
@@ -74,19 +237,39 @@ class Candidate(PersonMixin, db.Model):
 
 
 class Timeslot(db.Model):
-    """Entity representing discrete availability timeslot."""
+    """
+    Entity representing discrete availability timeslot.
+
+    The ID of timeslot is its index within a week (see `slots` module), while day,
+    hour and minute are derived from it. The same columns are available in SQL via
+    `timeslots_verbose` view.
+    """
 
     __tablename__ = 'timeslots'
-    id = db.Column(db.Integer, primary_key=True)
-    day = db.Column(days_of_week_enum, nullable=False)
-    hour = db.Column(hours_enum, nullable=False)
-    minute = db.Column(minutes_enum, nullable=False)
+    __table_args__ = (
+        db.CheckConstraint(f'id >= 0 AND id < {SLOTS_PER_WEEK}', name='ck_timeslots_id'),
+    )
+    id = db.Column(db.SmallInteger, primary_key=True, autoincrement=False)
+
+    @property
+    def day(self):
+        return slot_parts(self.id)[0]
+
+    @property
+    def hour(self):
+        return slot_parts(self.id)[1]
+
+    @property
+    def minute(self):
+        return slot_parts(self.id)[2]
 
 
 class Interview(db.Model):
     """The list of allocated interviews."""
 
     __tablename__ = 'interviews'
+    __table_args__ = (db.Index('ix_interviews_employee_id_week', 'employee_id', 'week'),
+                      db.Index('ix_interviews_candidate_id', 'candidate_id'))
     id = db.Column(db.Integer, primary_key=True)
     employee_id = db.Column(
         db.Integer,
@@ -96,22 +279,60 @@ class Interview(db.Model):
         db.Integer,
         db.ForeignKey('candidates.id', ondelete='CASCADE'),
         nullable=False)
-    start = db.Column(db.Integer, db.ForeignKey('timeslots.id'), nullable=False)
+    start_id = db.Column(
+        'start',
+        db.SmallInteger,
+        db.ForeignKey('timeslots.id'),
+        nullable=False)
+    week = db.Column(db.Date, nullable=False)
     duration_in_timeslots = db.Column(db.Integer, nullable=False)
+    version = db.Column(db.Integer, nullable=False, server_default='1')
+    __mapper_args__ = {'version_id_col': version}
+
+    @property
+    def starts_at(self):
+        return slot_datetime(self.week, self.start_id)
+
+    @property
+    def duration_in_minutes(self):
+        return TIMESLOT_DURATION * self.duration_in_timeslots
 
     @property
     def verbose_start(self):
-        start = self.start
-        verbose = f'On {start.day} at {int(start.hour):02d}:{int(start.minute):02d}'
+        starts_at = self.starts_at
+        verbose = f'On {starts_at:%A, %Y-%m-%d} at {starts_at:%H:%M}'
         return verbose
 
     @property
     def verbose_duration(self):
-        minutes = TIMESLOT_DURATION * self.duration_in_timeslots
+        minutes = self.duration_in_minutes
         whole_hours = minutes // MINUTES_PER_HOUR
-        rest_of_minutes = minutes - (hours * MINUTES_PER_HOUR)
+        rest_of_minutes = minutes - (whole_hours * MINUTES_PER_HOUR)
         return f'{whole_hours}h {rest_of_minutes}m'
 
 
+class ArchivedInterview(db.Model):
+    """
+    Interview of a past week moved out of `interviews`, so the scheduling
+    queries and person's interviews never touch the history.
+    """
+
+    __tablename__ = 'interviews_archive'
+    __table_args__ = (db.Index('ix_interviews_archive_employee_id', 'employee_id'),
+                      db.Index('ix_interviews_archive_candidate_id', 'candidate_id'))
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    employee_id = db.Column(
+        db.Integer,
+        db.ForeignKey('employees.id', ondelete='CASCADE'),
+        nullable=False)
+    candidate_id = db.Column(
+        db.Integer,
+        db.ForeignKey('candidates.id', ondelete='CASCADE'),
+        nullable=False)
+    start_id = db.Column('start', db.SmallInteger, nullable=False)
+    week = db.Column(db.Date, nullable=False)
+    duration_in_timeslots = db.Column(db.Integer, nullable=False)
+
+
 def entity_with_id(entity_cls, id_value):
     return entity_cls.query.filter_by(id=id_value).first()
@@ -0,0 +1,162 @@
+"""
+Weekly partitions of availability tables.
+
+Availability tables are partitioned by week, so scheduling queries for a week
+touch only its partition and the past weeks are removed by dropping their
+partitions instead of deleting rows. Each table has a default partition
+receiving the weeks without their own partition.
+
+Attaching and detaching a partition takes ACCESS EXCLUSIVE lock on the parent
+table (PostgreSQL 11), blocking every query of the availability until the lock
+is released, and the attaching also scans the default partition while holding
+it. So the partitions are created well ahead of the scheduling horizon, while
+they and the default partition hold no rows of their weeks yet, and the past
+weeks are dropped by a separate step expected to be scheduled at low traffic
+(see `manage.py weeks`). Both wait for the lock at most `LOCK_TIMEOUT`, so they
+do not queue the hot path behind a long transaction, and skip the partitions
+they could not lock until the next run.
+
+The same step removes the rest of the past weeks data: the exceptions of the
+past weeks are deleted, and their interviews are moved into the archive table,
+so the interviews of persons never accumulate. The past weeks cannot be
+scheduled or queried through the API, so no cached masks are affected.
+"""
+from datetime import datetime
+
+from sqlalchemy.exc import OperationalError
+
+from . import db
+from .models import EmployeeException, CandidateException
+from .weeks import ONE_WEEK, current_week, horizon
+
+
+PARTITIONED_TABLES = ('employee_availability', 'candidate_availability')
+LOCK_TIMEOUT = '2s'
+LOCK_NOT_AVAILABLE = '55P03'
+ARCHIVED_COLUMNS = 'id, employee_id, candidate_id, start, week, duration_in_timeslots'
+
+
+def create_default_partitions():
+    for table in PARTITIONED_TABLES:
+        db.session.execute(db.text(
+            f'CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT'))
+    db.session.commit()
+
+
+def week_partitions(table):
+    """Returns weekly partitions of table as a dictionary keyed by week."""
+
+    rows = db.session.execute(db.text("""
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class AS parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class AS child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = :table
+    """), {'table': table})
+    partitions = {}
+    for name, in rows:
+        suffix = name[len(table) + 1:]
+        if suffix.isdigit():
+            partitions[datetime.strptime(suffix, '%Y%m%d').date()] = name
+    return partitions
+
+
+def create_partition(table, week):
+    """
+    Creates a partition of table for the given week moving the week's rows from
+    the default partition into it.
+    """
+    name = f'{table}_{week:%Y%m%d}'
+    _set_lock_timeout()
+    db.session.execute(db.text(
+        f'CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'))
+    db.session.execute(db.text(f"""
+        WITH moved AS (
+            DELETE FROM {table}_default WHERE week = :week RETURNING *)
+        INSERT INTO {name} SELECT * FROM moved
+    """), {'week': week})
+    db.session.execute(db.text(
+        f"ALTER TABLE {table} ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{week}') TO ('{week + ONE_WEEK}')"))
+    db.session.commit()
+    return name
+
+
+def drop_partition(table, week):
+    name = f'{table}_{week:%Y%m%d}'
+    _set_lock_timeout()
+    db.session.execute(db.text(f'ALTER TABLE {table} DETACH PARTITION {name}'))
+    db.session.execute(db.text(f'DROP TABLE {name}'))
+    db.session.commit()
+    return name
+
+
+def create_partitions(weeks, today=None):
+    """
+    Creates the missing partitions for `weeks` weeks starting from the current
+    one. Returns the list of created partitions names.
+    """
+    created = []
+    for table in PARTITIONED_TABLES:
+        partitions = week_partitions(table)
+        for week in horizon(weeks, today):
+            if week not in partitions:
+                name = _unless_locked(create_partition, table, week)
+                if name is not None:
+                    created.append(name)
+    return created
+
+
+def drop_partitions(today=None):
+    """
+    Removes availability of the weeks before the current one. Returns the list
+    of dropped partitions names.
+    """
+    dropped = []
+    first = current_week(today)
+    for table in PARTITIONED_TABLES:
+        for week in sorted(week_partitions(table)):
+            if week < first:
+                name = _unless_locked(drop_partition, table, week)
+                if name is not None:
+                    dropped.append(name)
+        db.session.execute(db.text(
+            f'DELETE FROM {table}_default WHERE week < :week'), {'week': first})
+        db.session.commit()
+    return dropped
+
+
+def prune_past_weeks(today=None):
+    """
+    Deletes exceptions of the weeks before the current one and archives their
+    interviews. Returns the numbers of deleted exceptions and archived interviews.
+    """
+    first = current_week(today)
+    deleted = 0
+    for model in (EmployeeException, CandidateException):
+        deleted += (model.query
+                    .filter(model.week < first)
+                    .delete(synchronize_session=False))
+    archived = db.session.execute(db.text(f"""
+        WITH moved AS (
+            DELETE FROM interviews WHERE week < :week
+            RETURNING {ARCHIVED_COLUMNS})
+        INSERT INTO interviews_archive ({ARCHIVED_COLUMNS})
+        SELECT {ARCHIVED_COLUMNS} FROM moved
+    """), {'week': first}).rowcount
+    db.session.commit()
+    return deleted, archived
+
+
+def _set_lock_timeout():
+    db.session.execute(db.text(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'"))
+
+
+def _unless_locked(function, table, week):
+    try:
+        return function(table, week)
+    except OperationalError as e:
+        db.session.rollback()
+        if getattr(e.orig, 'pgcode', None) != LOCK_NOT_AVAILABLE:
+            raise
+        return None
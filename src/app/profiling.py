@@ -0,0 +1,146 @@
+"""
+Opt-in sampling profiler of individual requests.
+
+A request is profiled if it has `PROFILING_HEADER` header (when
+`PROFILING_ENABLED` is set) or if it is every `PROFILING_SAMPLE_EVERY`-th request
+handled by the process. While a profiled request runs, a background thread
+samples the stack of the request's thread every `PROFILING_INTERVAL` seconds.
+The samples are written in the collapsed stacks format (one `frame;frame;...
+count` line per distinct stack) understood by flamegraph tools into
+`PROFILING_DIR`, and the oldest profiles are removed once the directory exceeds
+`PROFILING_QUOTA_BYTES`.
+"""
+import os
+import sys
+import threading
+from collections import Counter
+from datetime import datetime
+from itertools import count
+
+from flask import g, request
+
+
+PROFILE_SUFFIX = '.folded'
+
+
+class StackSampler(threading.Thread):
+    """Collects stacks of a thread until stopped and writes them into a file."""
+
+    def __init__(self, thread_id, interval, path, on_finish):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.path = path
+        self.on_finish = on_finish
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+
+    def run(self):
+        while True:
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[_collapse(frame)] += 1
+            del frame
+            if self._stopped.wait(self.interval):
+                break
+        with open(self.path, 'w') as file:
+            for stack, samples in self.stacks.most_common():
+                file.write('%s %d\n' % (stack, samples))
+        self.on_finish(self)
+
+    def stop(self):
+        self._stopped.set()
+
+
+class RequestProfiler:
+    """Starts stack samplers for the requests chosen to be profiled."""
+
+    def __init__(self):
+        self.enabled = False
+        self.header = None
+        self.sample_every = 0
+        self.interval = 0.005
+        self.directory = None
+        self.quota_bytes = 0
+        self._counter = count(1)
+        self._samplers = set()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.enabled = app.config['PROFILING_ENABLED']
+        self.header = app.config['PROFILING_HEADER']
+        self.sample_every = app.config['PROFILING_SAMPLE_EVERY']
+        self.interval = app.config['PROFILING_INTERVAL']
+        self.directory = app.config['PROFILING_DIR']
+        self.quota_bytes = app.config['PROFILING_QUOTA_BYTES']
+        app.before_request(self._start_request)
+        app.teardown_request(self._finish_request)
+
+    def should_profile(self):
+        if self.enabled and request.headers.get(self.header):
+            return True
+        return self.sample_every > 0 and next(self._counter) % self.sample_every == 0
+
+    def join(self):
+        """Waits until profiles of the finished requests are written."""
+
+        with self._lock:
+            samplers = list(self._samplers)
+        for sampler in samplers:
+            sampler.join()
+
+    def _start_request(self):
+        if not self.should_profile():
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        name = '%s_%s_%d%s' % (datetime.now().strftime('%Y%m%d_%H%M%S_%f'),
+                               request.endpoint or 'unmatched', os.getpid(),
+                               PROFILE_SUFFIX)
+        sampler = StackSampler(threading.get_ident(), self.interval,
+                               os.path.join(self.directory, name), self._sampler_finished)
+        with self._lock:
+            self._samplers.add(sampler)
+        g.profiling_sampler = sampler
+        sampler.start()
+
+    def _finish_request(self, exc):
+        sampler = g.pop('profiling_sampler', None)
+        if sampler is not None:
+            sampler.stop()
+
+    def _sampler_finished(self, sampler):
+        with self._lock:
+            self._samplers.discard(sampler)
+            enforce_quota(self.directory, self.quota_bytes)
+
+
+request_profiler = RequestProfiler()
+
+
+def enforce_quota(directory, quota_bytes):
+    """Removes the oldest profiles until the directory fits into the quota."""
+
+    profiles = []
+    for entry in os.scandir(directory):
+        if entry.name.endswith(PROFILE_SUFFIX) and entry.is_file():
+            stat = entry.stat()
+            profiles.append((stat.st_mtime, entry.name, stat.st_size, entry.path))
+    profiles.sort()
+    total = sum(size for _, _, size, _ in profiles)
+    removed = []
+    for _, name, size, path in profiles:
+        if total <= quota_bytes:
+            break
+        os.remove(path)
+        total -= size
+        removed.append(name)
+    return removed
+
+
+def _collapse(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append('%s.%s' % (frame.f_globals.get('__name__', '?'), code.co_name))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
@@ -0,0 +1,26 @@
+"""
+The timeslots grid.
+
+The `timeslots` table contains exactly one record per timeslot of a week with
+the timeslot's index as its ID, so its content is fully defined by `slots`
+module. The grid is created by migrations, and the function below allows to
+create it for a database set up with `create_all`.
+"""
+from sqlalchemy.dialects.postgresql import insert
+
+from . import db
+from .models import Timeslot
+from scheduling.slots import SLOTS_PER_WEEK
+
+
+def materialize_timeslots():
+    """
+    Creates the missing records of timeslots grid and returns the number of records.
+
+    Concurrent calls are safe because the timeslot's ID is defined by its index.
+    """
+    rows = [{'id': index} for index in range(SLOTS_PER_WEEK)]
+    statement = insert(Timeslot.__table__).values(rows).on_conflict_do_nothing()
+    db.session.execute(statement)
+    db.session.commit()
+    return Timeslot.query.count()
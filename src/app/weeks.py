@@ -0,0 +1,57 @@
+"""
+Calendar weeks of the scheduling horizon.
+
+Availability and interviews are planned for actual calendar weeks, each one
+identified by the date of its Monday, while timeslots are indexed within a
+week (see `slots` module). Only the weeks of a rolling horizon starting from
+the current week can be scheduled.
+"""
+from datetime import date, datetime, timedelta
+
+from scheduling.slots import SLOTS_PER_DAY, slot_parts
+
+
+ONE_WEEK = timedelta(days=7)
+
+
+def week_of(day):
+    """Returns the Monday of the week including given date."""
+
+    return day - timedelta(days=day.weekday())
+
+
+def current_week(today=None):
+    return week_of(today or date.today())
+
+
+def next_week(today=None):
+    return current_week(today) + ONE_WEEK
+
+
+def horizon(weeks, today=None):
+    """Returns the list of Mondays of `weeks` weeks starting from the current one."""
+
+    first = current_week(today)
+    return [first + ONE_WEEK * offset for offset in range(weeks)]
+
+
+def parse_week(value, weeks, today=None):
+    """
+    Converts a date in ISO format into the Monday of its week. Returns None if the
+    value is not a date or the week is beyond the horizon of `weeks` weeks.
+    """
+    try:
+        week = week_of(datetime.strptime(str(value), '%Y-%m-%d').date())
+    except ValueError:
+        return None
+    if week not in horizon(weeks, today):
+        return None
+    return week
+
+
+def slot_datetime(week, index):
+    """Returns the date and time when timeslot with given index starts."""
+
+    _, hour, minute = slot_parts(index)
+    day = week + timedelta(days=index // SLOTS_PER_DAY)
+    return datetime(day.year, day.month, day.day, hour, minute)
@@ -0,0 +1,151 @@
+"""
+Interview booking throughput under concurrent clients.
+
+Every client is a thread with its own test client and database session booking
+interviews of randomly chosen employees through `/api/v1/interview`. Clients
+compete for the same employees, so a part of requests is expected to get 409
+responses; any other error (e.g. caused by a deadlock) is reported separately.
+
+Usage (from `src` directory, with the database migrated):
+
+    python -m benchmarks.booking --clients 50 --bookings 40
+
+"""
+import os
+import json
+import time
+import random
+import argparse
+import threading
+from collections import Counter
+
+from app import create_app, db
+from app.models import Employee, Candidate, EmployeeAvailability, CandidateAvailability
+from scheduling.slots import slot_index, span, days_of_week
+from app.weeks import next_week
+
+
+WORKING_DAYS = days_of_week[:5]
+WORKING_HOURS = 9, 17
+CLIENTS = 50
+BOOKINGS = 40
+EMPLOYEES = 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--config', default=os.getenv('APP_CONFIG') or 'default')
+    parser.add_argument('--clients', type=int, default=CLIENTS)
+    parser.add_argument('--bookings', type=int, default=BOOKINGS,
+                        help='number of booking requests per client')
+    parser.add_argument('--employees', type=int, default=EMPLOYEES)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    print(json.dumps(run(**vars(args)), indent=2))
+
+
+def run(config, clients=CLIENTS, bookings=BOOKINGS, employees=EMPLOYEES, seed=1):
+    app = create_app(config)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'pool_size': clients, 'max_overflow': 0}
+    with app.app_context():
+        employees_ids, candidates_ids = _create_persons(employees, clients * bookings)
+        deadlocks_before = _deadlocks()
+
+    statuses, latencies = Counter(), []
+    lock = threading.Lock()
+
+    def client(number):
+        rng = random.Random(seed + number)
+        own_candidates = candidates_ids[number * bookings:(number + 1) * bookings]
+        with app.app_context():
+            test_client = app.test_client()
+            for candidate_id in own_candidates:
+                first, last = WORKING_HOURS
+                minutes = 60 * first + 15 * rng.randrange(4 * (last - first) - 1)
+                data = {'employee': rng.choice(employees_ids),
+                        'candidate': candidate_id,
+                        'day': rng.choice(WORKING_DAYS),
+                        'time': '%02d:%02d' % divmod(minutes, 60),
+                        'duration': 30}
+                started = time.perf_counter()
+                response = test_client.post('/api/v1/interview', json=data)
+                elapsed = time.perf_counter() - started
+                with lock:
+                    statuses[response.status_code] += 1
+                    latencies.append(elapsed)
+
+    threads = [threading.Thread(target=client, args=(number,))
+               for number in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        deadlocks = _deadlocks() - deadlocks_before
+        overlaps = _overlapping_interviews(employees_ids)
+        _drop_persons(employees_ids, candidates_ids)
+
+    latencies.sort()
+    return {
+        'clients': clients,
+        'requests': len(latencies),
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(len(latencies) / elapsed, 1),
+        'booked_per_second': round(statuses[200] / elapsed, 1),
+        'latency_p50_ms': round(1000 * latencies[len(latencies) // 2], 2),
+        'latency_p95_ms': round(1000 * latencies[int(len(latencies) * 0.95)], 2),
+        'statuses': {str(code): count for code, count in sorted(statuses.items())},
+        'deadlocks': deadlocks,
+        'overlapping_interviews': overlaps}
+
+
+def _create_persons(employees_count, candidates_count):
+    first, last = WORKING_HOURS
+    week, available = next_week(), 0
+    for day in WORKING_DAYS:
+        available |= span(slot_index(day, first, 0), 4 * (last - first))
+    employees = [Employee(first_name='Benchmark', last_name='Employee %d' % i,
+                          availability=EmployeeAvailability.from_mask(
+                              available, week=week))
+                 for i in range(employees_count)]
+    candidates = [Candidate(first_name='Benchmark', last_name='Candidate %d' % i,
+                            email='benchmark_%d@mail.com' % i,
+                            availability=CandidateAvailability.from_mask(
+                                available, week=week))
+                  for i in range(candidates_count)]
+    db.session.add_all(employees + candidates)
+    db.session.commit()
+    return [e.id for e in employees], [c.id for c in candidates]
+
+
+def _drop_persons(employees_ids, candidates_ids):
+    Employee.query.filter(Employee.id.in_(employees_ids)).delete(
+        synchronize_session=False)
+    Candidate.query.filter(Candidate.id.in_(candidates_ids)).delete(
+        synchronize_session=False)
+    db.session.commit()
+
+
+def _deadlocks():
+    return db.session.execute(db.text(
+        'SELECT deadlocks FROM pg_stat_database WHERE datname = current_database()'
+    )).scalar()
+
+
+def _overlapping_interviews(employees_ids):
+    return db.session.execute(db.text("""
+        SELECT count(*)
+        FROM interviews AS a
+        JOIN interviews AS b
+          ON a.employee_id = b.employee_id AND a.week = b.week AND a.id < b.id
+         AND int4range(a.start, a.start + a.duration_in_timeslots) &&
+             int4range(b.start, b.start + b.duration_in_timeslots)
+        WHERE a.employee_id = ANY(:ids)
+    """), {'ids': list(employees_ids)}).scalar()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Synthetic populations of employees and candidates for benchmarks.
+
+Employees work most of the weekdays with a start and an end of their working
+day varying around 9:00-17:00 and a lunch break on some days. Candidates are
+available a few hours on a couple of days only. The persons are inserted with a
+handful of bulk statements, so populations of 100k persons are created in
+seconds, and are removed (with their availability) by `drop`.
+"""
+import random
+from uuid import uuid4
+
+from app import db
+from app.models import Employee, Candidate, EmployeeAvailability, CandidateAvailability
+from scheduling.slots import EMPTY, slot_index, span, days_of_week, to_intervals
+from app.weeks import next_week
+
+
+WORKING_DAYS = days_of_week[:5]
+INSERT_BATCH_SIZE = 10000
+
+
+class Population:
+    """
+    IDs of the generated persons mapped to their availability for the week. The
+    persons are named 'Bench' and '<token> <N>' with N starting from 1. The IDs of
+    employees created by benchmarks are added to `created` to be dropped as well.
+    """
+
+    def __init__(self, token, week, employees, candidates):
+        self.token = token
+        self.week = week
+        self.employees = employees
+        self.candidates = candidates
+        self.created = []
+
+    @property
+    def employees_ids(self):
+        return list(self.employees)
+
+    @property
+    def candidates_ids(self):
+        return list(self.candidates)
+
+
+def employee_mask(rng):
+    """Returns a random week of an employee working about 9:00-17:00 on weekdays."""
+
+    mask = EMPTY
+    for day in WORKING_DAYS:
+        if rng.random() < 0.1:
+            continue
+        start = slot_index(day, 8, 0) + rng.randrange(9)
+        end = slot_index(day, 16, 0) + rng.randrange(9)
+        mask |= span(start, end - start)
+        if rng.random() < 0.7:
+            mask &= ~span(slot_index(day, 12, 0) + rng.randrange(3), 4)
+    return mask
+
+
+def candidate_mask(rng):
+    """Returns a random week of a candidate available a few hours on 1-3 days."""
+
+    mask = EMPTY
+    for day in rng.sample(WORKING_DAYS, rng.randint(1, 3)):
+        start = slot_index(day, 9, 0) + rng.randrange(28)
+        mask |= span(start, 4 * rng.randint(1, 4))
+    return mask
+
+
+def generate(employees_count, candidates_count, seed=1, week=None):
+    """Creates a population of persons available in the week (the next one by default)."""
+
+    rng = random.Random(seed)
+    week = week or next_week()
+    token = uuid4().hex[:8]
+    employees = _insert_persons(Employee, EmployeeAvailability, 'employee_id',
+                                employees_count, token, week, rng, employee_mask)
+    candidates = _insert_persons(Candidate, CandidateAvailability, 'candidate_id',
+                                 candidates_count, token, week, rng, candidate_mask)
+    db.session.commit()
+    return Population(token, week, employees, candidates)
+
+
+def drop(population):
+    """Deletes the persons of population with their availability and interviews."""
+
+    for person_cls, ids in ((Employee, population.employees_ids + population.created),
+                            (Candidate, population.candidates_ids)):
+        for offset in range(0, len(ids), INSERT_BATCH_SIZE):
+            batch = ids[offset:offset + INSERT_BATCH_SIZE]
+            person_cls.query.filter(person_cls.id.in_(batch)).delete(
+                synchronize_session=False)
+    db.session.commit()
+
+
+def _insert_persons(person_cls, interval_cls, person_key, count, token, week, rng,
+                    mask_function):
+    if not count:
+        return {}
+    table = person_cls.__tablename__
+    extra_columns, extra_values = '', ''
+    if person_cls is Candidate:
+        extra_columns = ', email'
+        extra_values = ", 'bench_' || :token || '_' || n || '@mail.com'"
+    ids = db.session.execute(db.text(f"""
+        INSERT INTO {table} (first_name, last_name{extra_columns})
+        SELECT 'Bench', :token || ' ' || n{extra_values}
+        FROM generate_series(1, :count) AS n
+        RETURNING id
+    """), {'token': token, 'count': count}).scalars().all()
+
+    masks = {person_id: mask_function(rng) for person_id in ids}
+    rows = [{person_key: person_id, 'week': week, 'start_slot': start, 'end_slot': end}
+            for person_id, mask in masks.items()
+            for start, end in to_intervals(mask)]
+    for offset in range(0, len(rows), INSERT_BATCH_SIZE):
+        db.session.execute(interval_cls.__table__.insert(),
+                           rows[offset:offset + INSERT_BATCH_SIZE])
+    return masks
@@ -0,0 +1,298 @@
+"""
+Scheduling endpoints and scheduling core benchmarks.
+
+For each population size, a synthetic population of employees and candidates is
+created (see `benchmarks.population`) and every endpoint benchmark is repeated
+with randomly chosen persons, both in-process through Flask test client and over
+HTTP through a local server. The scheduling core is timed on the same kind of
+masks without the database, and the concurrent booking benchmark can be added
+with `--booking`. Results are printed as JSON, so they can be stored and
+compared between commits.
+
+Usage (from `src` directory, with the database migrated):
+
+    python manage.py bench --sizes 10,1000 --repeat 50 --output bench.json
+    python -m benchmarks.suite --sizes 10,1000 --repeat 50
+
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import threading
+import subprocess
+import http.client
+from collections import Counter
+from datetime import datetime
+from urllib.parse import urlencode
+from uuid import uuid4
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from app import create_app, db
+from app.availability import availability_cache
+from scheduling import BatchScheduler, SchedulingRequest, PersonAvailability
+from scheduling import windows_mask, at_least, intersect, interview_starts
+from benchmarks import booking, population
+
+
+DEFAULT_SIZES = (10, 1000, 100000)
+PANEL_SIZE = 5
+TRANSPORTS = ('in_process', 'http')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--config', default=os.getenv('APP_CONFIG') or 'default')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)))
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--booking', action='store_true',
+                        help='also run the concurrent booking benchmark')
+    parser.add_argument('--output', default=None)
+    args = parser.parse_args()
+    app = create_app(args.config)
+    report = run(app, parse_sizes(args.sizes), args.repeat, args.seed, args.booking,
+                 config_name=args.config)
+    write_report(report, args.output)
+
+
+def parse_sizes(sizes):
+    return [int(size) for size in sizes.split(',') if size.strip()]
+
+
+def write_report(report, output=None):
+    text = json.dumps(report, indent=2)
+    if output is None:
+        print(text)
+    else:
+        with open(output, 'w') as file:
+            file.write(text + '\n')
+
+
+def run(app, sizes, repeat=20, seed=1, with_booking=False, config_name=None):
+    """Runs all benchmarks and returns the report."""
+
+    results = []
+    with app.app_context():
+        meta = _meta(app, sizes, repeat, seed)
+    for size in sizes:
+        with app.app_context():
+            generated = population.generate(size, size, seed=seed)
+        try:
+            # requests push their own app contexts, so each gets a fresh session
+            for transport in TRANSPORTS:
+                results.extend(_run_endpoints(app, transport, generated, size,
+                                              repeat, seed))
+        finally:
+            with app.app_context():
+                population.drop(generated)
+
+    report = {'meta': meta, 'endpoints': results, 'core': core(sizes, repeat, seed)}
+    if with_booking:
+        report['booking'] = booking.run(config_name or 'default', seed=seed)
+    return report
+
+
+def core(sizes, repeat=20, seed=1):
+    """Times the in-memory scheduling functions on synthetic availability masks."""
+
+    results = []
+    for size in sizes:
+        rng = random.Random(seed)
+        employees = [population.employee_mask(rng) for _ in range(size)]
+        candidates = [population.candidate_mask(rng) for _ in range(size)]
+        panel = employees[:PANEL_SIZE]
+        available = [PersonAvailability(i, str(i), mask)
+                     for i, mask in enumerate(employees)]
+        requests = [SchedulingRequest(i, mask, rng.sample(range(size), min(size, 3)), 4)
+                    for i, mask in enumerate(candidates[:200])]
+        benchmarks = {
+            'windows_mask': lambda: [windows_mask(mask, 4) for mask in employees],
+            'intersect_panel': lambda: [intersect(mask, *panel) for mask in candidates],
+            'at_least_panel': lambda: at_least(panel, PANEL_SIZE - 1),
+            'interview_starts': lambda: interview_starts(available, 4, candidates[0]),
+            'batch_scheduler': lambda: BatchScheduler(dict(enumerate(employees)))
+                                       .schedule(requests),
+        }
+        for name, function in benchmarks.items():
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                function()
+                timings.append(time.perf_counter() - started)
+            results.append({'size': size, 'benchmark': name, **_stats(timings)})
+    return results
+
+
+class InProcessClient:
+    """Sends requests to the app through Flask test client."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, data=None, query=None):
+        response = self.client.open(path, method=method, json=data or {},
+                                    query_string=query)
+        return response.status_code, response.get_json(silent=True)
+
+
+class HttpClient:
+    """Sends requests to the app served by a local server in a background thread."""
+
+    def __init__(self, app):
+        self.server = make_server('127.0.0.1', 0, app, threaded=True,
+                                  request_handler=_QuietRequestHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def request(self, method, path, data=None, query=None):
+        if query:
+            path += '?' + urlencode(query)
+        connection = http.client.HTTPConnection('127.0.0.1', self.server.server_port)
+        try:
+            connection.request(method, path, body=json.dumps(data or {}),
+                               headers={'Content-Type': 'application/json'})
+            response = connection.getresponse()
+            body = response.read()
+            return response.status, _parse_json(body)
+        finally:
+            connection.close()
+
+    def close(self):
+        self.server.shutdown()
+        self.thread.join()
+
+
+class _QuietRequestHandler(WSGIRequestHandler):
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def _run_endpoints(app, transport, generated, size, repeat, seed):
+    client = InProcessClient(app) if transport == 'in_process' else HttpClient(app)
+    try:
+        results = []
+        for name, benchmark in ENDPOINTS.items():
+            rng = random.Random(seed)
+            timings, statuses = [], Counter()
+            for _ in range(repeat):
+                started = time.perf_counter()
+                status, _ = benchmark(client, generated, rng)
+                timings.append(time.perf_counter() - started)
+                statuses[status] += 1
+            statuses = {str(code): count for code, count in sorted(statuses.items())}
+            results.append({'size': size, 'transport': transport, 'benchmark': name,
+                            **_stats(timings), 'statuses': statuses})
+        return results
+    finally:
+        if transport == 'http':
+            client.close()
+
+
+def _list_interviews(mode='each', strategy='bitset', cold=False):
+    def benchmark(client, generated, rng):
+        if cold:
+            availability_cache.clear()
+        employees = generated.employees_ids
+        data = {'candidate': rng.choice(generated.candidates_ids),
+                'employees': rng.sample(employees, min(PANEL_SIZE, len(employees))),
+                'duration': 60, 'mode': mode, 'strategy': strategy,
+                'week': generated.week.isoformat()}
+        return client.request('GET', '/api/v1/list_interviews', data)
+    return benchmark
+
+
+def _allocate(person_key, ids):
+    def benchmark(client, generated, rng):
+        hour = rng.randrange(8, 18)
+        data = {person_key: rng.choice(getattr(generated, ids)),
+                'week': generated.week.isoformat(),
+                'available': rng.random() < 0.8,
+                'slots': [{'day': rng.choice(population.WORKING_DAYS),
+                           'from': '%02d:00' % hour, 'to': '%02d:00' % (hour + 1)}]}
+        return client.request('POST', '/api/v1/allocate_%s_time' % person_key[:-3], data)
+    return benchmark
+
+
+def _get_person(person):
+    def benchmark(client, generated, rng):
+        count = len(getattr(generated, person + 's'))
+        data = {'first_name': 'Bench',
+                'last_name': '%s %d' % (generated.token, rng.randint(1, count))}
+        return client.request('GET', '/api/v1/' + person, data)
+    return benchmark
+
+
+def _create_employee(client, generated, rng):
+    data = {'first_name': 'Bench',
+            'last_name': '%s new %s' % (generated.token, uuid4().hex)}
+    status, body = client.request('POST', '/api/v1/employee', data)
+    if body and body.get('success'):
+        generated.created.append(body['id'])
+    return status, body
+
+
+def _list_employees(client, generated, rng):
+    query = {'limit': 50, 'prefix': generated.token}
+    return client.request('GET', '/api/v1/employees', query=query)
+
+
+ENDPOINTS = {
+    'list_interviews.each.bitset': _list_interviews(),
+    'list_interviews.each.bitset_cold': _list_interviews(cold=True),
+    'list_interviews.each.sql': _list_interviews(strategy='sql'),
+    'list_interviews.all.bitset': _list_interviews(mode='all'),
+    'allocate_employee_time': _allocate('employee_id', 'employees_ids'),
+    'allocate_candidate_time': _allocate('candidate_id', 'candidates_ids'),
+    'employee.get': _get_person('employee'),
+    'candidate.get': _get_person('candidate'),
+    'employee.create': _create_employee,
+    'employees.list': _list_employees,
+}
+
+
+def _parse_json(body):
+    try:
+        return json.loads(body)
+    except ValueError:
+        return None
+
+
+def _stats(timings):
+    timings = sorted(timings)
+
+    def percentile(q):
+        return round(1000 * timings[min(len(timings) - 1, int(len(timings) * q))], 3)
+
+    return {'repeat': len(timings),
+            'mean_ms': round(1000 * sum(timings) / len(timings), 3),
+            'p50_ms': percentile(0.5),
+            'p95_ms': percentile(0.95),
+            'p99_ms': percentile(0.99),
+            'max_ms': round(1000 * timings[-1], 3)}
+
+
+def _meta(app, sizes, repeat, seed):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL, universal_newlines=True,
+                                cwd=os.path.dirname(__file__)).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {'commit': commit or None,
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'postgresql': db.session.execute(db.text('SHOW server_version')).scalar(),
+            'sizes': sizes,
+            'repeat': repeat,
+            'seed': seed}
+
+
+if __name__ == '__main__':
+    main()
@@ -2,10 +2,18 @@
 Configuration and environment variables to setup the app.
 """
 import os
+import copy
+import json
+import atexit
 import logging
 import logging.config
+import logging.handlers
+import threading
+from queue import Queue, Full
 from datetime import datetime
 
+from flask import g, has_request_context
+
 
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 
@@ -20,23 +28,20 @@ LOGS_DIR = os.path.expanduser(os.path.join('~', 'logs', 'lanxess'))
 if not os.path.exists(LOGS_DIR):
     os.makedirs(LOGS_DIR)
 
-LAUNCH_TIME = datetime.now().strftime('%H_%M_%S_%y_%m_%d')
+LOG_FILE = os.path.join(LOGS_DIR, 'lanxess.log')
 
-LOG_FILE = os.path.join(LOGS_DIR, '%s.log' % LAUNCH_TIME)
+LOG_QUEUE_SIZE = 10000
 
 LOGGING_CONFIG = {
     'version': 1,
+    'disable_existing_loggers': False,
     'formatters': {
         'brief': {
             'format': '[%(asctime)s][%(levelname)-8s] %(message)s',
             'datefmt': '%Y-%m-%d %H:%M:%S'
         },
-        'full': {
-            'format': '%(asctime)s|'
-                      '%(levelname)-8s|'
-                      '%(module)s.%(funcName)s:%(lineno)d|'
-                      '%(message)s',
-            'datefmt': '%Y-%m-%d %H:%M:%S'
+        'json': {
+            '()': 'config.JsonFormatter'
         }
     },
     'handlers': {
@@ -45,9 +50,12 @@ LOGGING_CONFIG = {
             'formatter': 'brief'
         },
         'file': {
-            'class': 'logging.FileHandler',
-            'formatter': 'full',
-            'filename': LOG_FILE
+            # worker processes append to the same file, so it is rotated by
+            # logrotate and reopened once moved instead of being rotated here
+            'class': 'logging.handlers.WatchedFileHandler',
+            'formatter': 'json',
+            'filename': LOG_FILE,
+            'delay': True
         }
     },
     'loggers': {
@@ -56,6 +64,11 @@ LOGGING_CONFIG = {
             'handlers': ['console', 'file'],
             'level': 'DEBUG'
         },
+        'requests': {
+            'propagate': False,
+            'handlers': ['file'],
+            'level': 'INFO'
+        },
         'errors': {
             'propagate': False,
             'handlers': ['file'],
@@ -65,15 +78,109 @@ LOGGING_CONFIG = {
 }
 
 
-def get_logger(name='main', level=logging.INFO, dict_conf=LOGGING_CONFIG):
-    """A utility to simplify logger initialization."""
+class JsonFormatter(logging.Formatter):
+    """Formats records as JSON lines including request's ID and duration if any."""
+
+    extra_fields = ('request_id', 'duration')
+
+    def format(self, record):
+        entry = {'time': datetime.fromtimestamp(record.created).isoformat(),
+                 'level': record.levelname,
+                 'logger': record.name,
+                 'location': '%s.%s:%d' % (record.module, record.funcName, record.lineno),
+                 'message': record.getMessage()}
+        for field in self.extra_fields:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Puts records into a bounded queue without ever blocking the caller.
+
+    When the queue is full, records are dropped and counted, and a single warning
+    with the number of dropped records is logged once the queue has room again.
+    The ID of the request being handled is attached to records at this point, as
+    they are formatted in the listener's thread.
+    """
+
+    def __init__(self, queue):
+        super().__init__(queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # unlike the base class, keeps `exc_info` for the formatters to handle
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if getattr(record, 'request_id', None) is None and has_request_context():
+            record.request_id = g.get('request_id')
+        return record
+
+    def enqueue(self, record):
+        if self.dropped:
+            try:
+                self.queue.put_nowait(self._dropped_record(record.name))
+            except Full:
+                self.dropped += 1
+                return
+            self.dropped = 0
+        try:
+            self.queue.put_nowait(record)
+        except Full:
+            self.dropped += 1
+
+    def _dropped_record(self, name):
+        return logging.makeLogRecord({
+            'name': name, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+            'msg': '%d log records dropped as the logging queue was full',
+            'args': (self.dropped,)})
+
+
+_listeners = []
+_configure_lock = threading.Lock()
 
-    logging.config.dictConfig(dict_conf)
+
+def get_logger(name='main', level=logging.INFO, dict_conf=LOGGING_CONFIG):
+    """
+    A utility to simplify logger initialization.
+
+    Logging is configured on the first call only. Records of each configured
+    logger go through a queue to the logger's handlers running in a background
+    thread, so the callers never wait for console or disk.
+    """
+    with _configure_lock:
+        if not _listeners:
+            _configure_logging(dict_conf)
     log = logging.getLogger(name)
     log.setLevel(level=level)
     return log
 
 
+def _configure_logging(dict_conf):
+    logging.config.dictConfig(dict_conf)
+    for name in dict_conf.get('loggers', {}):
+        log = logging.getLogger(name)
+        queue_handler = DroppingQueueHandler(Queue(LOG_QUEUE_SIZE))
+        listener = logging.handlers.QueueListener(
+            queue_handler.queue, *log.handlers, respect_handler_level=True)
+        log.handlers = [queue_handler]
+        listener.start()
+        _listeners.append(listener)
+    atexit.register(_stop_listeners)
+
+
+def _stop_listeners():
+    """Writes out the records left in queues on the process exit."""
+
+    while _listeners:
+        _listeners.pop().stop()
+
+
 def env_var(var_name):
     if var_name not in os.environ:
         missing_env_var(var_name)
@@ -97,6 +204,17 @@ class Config:
     DEBUG = False
     TESTING = False
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SCHEDULING_HORIZON_WEEKS = 8
+    PARTITIONS_LEAD_WEEKS = 8
+    AVAILABILITY_CACHE_MAX_BYTES = 16 * 2**20
+    AVAILABILITY_CACHE_SYNC = False
+    SLOW_REQUEST_SECONDS = 1.0
+    PROFILING_ENABLED = False
+    PROFILING_HEADER = 'X-Profile'
+    PROFILING_SAMPLE_EVERY = 0
+    PROFILING_INTERVAL = 0.005
+    PROFILING_DIR = os.path.join(LOGS_DIR, 'profiles')
+    PROFILING_QUOTA_BYTES = 64 * 2**20
 
     @staticmethod
     def init_app(app):
@@ -117,6 +235,7 @@ class TestingConfig(Config):
 class ProductionConfig(Config):
     SECRET_KEY = env_var('APP_SECRET')
     SQLALCHEMY_DATABASE_URI = env_var('APP_DB_URL_PROD')
+    AVAILABILITY_CACHE_SYNC = True
 
 
 # ------------------
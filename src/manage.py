@@ -4,6 +4,9 @@ from flask_script import Manager, Shell
 from flask_migrate import Migrate, MigrateCommand
 
 from app import create_app, db, models
+from app.timeslots import materialize_timeslots
+from app.partitions import create_default_partitions, create_partitions, drop_partitions
+from app.partitions import prune_past_weeks
 from config import BASE_DIR
 
 
@@ -22,6 +25,45 @@ manager.add_command('db', MigrateCommand)
 @manager.command
 def db_create():
     db.create_all()
+    create_default_partitions()
+    materialize_timeslots()
+
+
+@manager.command
+def timeslots_create():
+    """Creates the missing records of timeslots grid."""
+    count = materialize_timeslots()
+    print('Timeslots grid contains %d records' % count)
+
+
+@manager.option('-d', '--drop', action='store_true',
+                help='also drop and archive the past weeks '
+                     '(locks availability tables, run at low traffic)')
+def weeks(drop=False):
+    """Creates partitions ahead of the scheduling horizon and drops the past weeks."""
+    count = app.config['SCHEDULING_HORIZON_WEEKS'] + app.config['PARTITIONS_LEAD_WEEKS']
+    for name in create_partitions(count):
+        print('Created partition %s' % name)
+    if drop:
+        for name in drop_partitions():
+            print('Dropped partition %s' % name)
+        deleted, archived = prune_past_weeks()
+        print('Deleted %d exceptions and archived %d interviews' % (deleted, archived))
+
+
+@manager.option('-s', '--sizes', default='10,1000,100000',
+                help='comma-separated numbers of generated employees and candidates')
+@manager.option('-r', '--repeat', type=int, default=20)
+@manager.option('--seed', type=int, default=1)
+@manager.option('-b', '--booking', action='store_true',
+                help='also run the concurrent booking benchmark')
+@manager.option('-o', '--output', default=None, help='JSON file to write results to')
+def bench(sizes, repeat, seed, booking, output):
+    """Runs the benchmark suite against the configured database."""
+    from benchmarks import suite
+    report = suite.run(app, suite.parse_sizes(sizes), repeat, seed, booking,
+                       config_name=os.getenv('APP_CONFIG') or 'default')
+    suite.write_report(report, output)
 
 
 @manager.option('-t', '--test-path', default=os.path.join(BASE_DIR, 'tests'))
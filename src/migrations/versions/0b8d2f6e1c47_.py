@@ -0,0 +1,94 @@
+"""Availability and interviews planned for calendar weeks.
+
+Revision ID: 0b8d2f6e1c47
+Revises: 65c9b8f95b30
+Create Date: 2026-10-18 16:37:12.408311
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b8d2f6e1c47'
+down_revision = '65c9b8f95b30'
+branch_labels = None
+depends_on = None
+
+
+SLOTS_PER_WEEK = 672
+
+# the existing availability and interviews were planned for the upcoming week
+NEXT_WEEK = "date_trunc('week', now() + interval '1 week')::date"
+
+# (availability table, person column, persons table)
+TABLES = (('employee_availability', 'employee_id', 'employees'),
+          ('candidate_availability', 'candidate_id', 'candidates'))
+
+
+def upgrade():
+    op.add_column('interviews', sa.Column('week', sa.Date(), nullable=True))
+    op.execute(f'UPDATE interviews SET week = {NEXT_WEEK}')
+    op.alter_column('interviews', 'week', nullable=False)
+
+    for table, person_column, persons in TABLES:
+        op.execute(f'CREATE TEMPORARY TABLE {table}_copy AS SELECT * FROM {table}')
+        op.drop_table(table)
+        _create_availability_table(
+            table, person_column, persons,
+            primary_key=(person_column, 'week', 'start_slot'),
+            week=True)
+        op.execute(f'CREATE TABLE {table}_default PARTITION OF {table} DEFAULT')
+        op.execute(f"""
+            INSERT INTO {table} ({person_column}, week, start_slot, end_slot)
+            SELECT {person_column}, {NEXT_WEEK}, start_slot, end_slot
+            FROM {table}_copy
+        """)
+        op.execute(f'DROP TABLE {table}_copy')
+
+
+def downgrade():
+    # a single week of availability is kept, the same one the upgrade assigns
+    for table, person_column, persons in TABLES:
+        op.execute(f"""
+            CREATE TEMPORARY TABLE {table}_copy AS
+            SELECT {person_column}, start_slot, end_slot
+            FROM {table}
+            WHERE week = {NEXT_WEEK}
+        """)
+        op.drop_table(table)
+        _create_availability_table(
+            table, person_column, persons,
+            primary_key=(person_column, 'start_slot'),
+            week=False)
+        op.execute(f"""
+            INSERT INTO {table} ({person_column}, start_slot, end_slot)
+            SELECT {person_column}, start_slot, end_slot
+            FROM {table}_copy
+        """)
+        op.execute(f'DROP TABLE {table}_copy')
+
+    op.drop_column('interviews', 'week')
+
+
+def _create_availability_table(table, person_column, persons, primary_key, week):
+    columns = [sa.Column(person_column, sa.Integer(), nullable=False)]
+    if week:
+        columns.append(sa.Column('week', sa.Date(), nullable=False))
+    op.create_table(
+        table,
+        *columns,
+        sa.Column('start_slot', sa.SmallInteger(), nullable=False),
+        sa.Column('end_slot', sa.SmallInteger(), nullable=False),
+        sa.CheckConstraint(
+            f'start_slot >= 0 AND start_slot < end_slot AND '
+            f'end_slot <= {SLOTS_PER_WEEK}',
+            name=f'ck_{table}_slots'),
+        sa.ForeignKeyConstraint(
+            [person_column], [f'{persons}.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint(*primary_key, name=f'{table}_pkey'),
+        **({'postgresql_partition_by': 'RANGE (week)'} if week else {}))
+    op.execute(f"""
+        CREATE INDEX ix_{table}_slots ON {table}
+        USING gist (int4range(start_slot, end_slot))
+    """)
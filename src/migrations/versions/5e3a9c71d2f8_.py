@@ -0,0 +1,49 @@
+"""Recurring availability templates and week exceptions.
+
+Revision ID: 5e3a9c71d2f8
+Revises: 0b8d2f6e1c47
+Create Date: 2026-10-18 18:11:40.925316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e3a9c71d2f8'
+down_revision = '0b8d2f6e1c47'
+branch_labels = None
+depends_on = None
+
+
+SLOTS_PER_WEEK = 672
+
+# (table, person column, persons table, has week)
+TABLES = (('employee_templates', 'employee_id', 'employees', False),
+          ('candidate_templates', 'candidate_id', 'candidates', False),
+          ('employee_exceptions', 'employee_id', 'employees', True),
+          ('candidate_exceptions', 'candidate_id', 'candidates', True))
+
+
+def upgrade():
+    for table, person_column, persons, has_week in TABLES:
+        key = [person_column, 'week'] if has_week else [person_column]
+        week = [sa.Column('week', sa.Date(), nullable=False)] if has_week else []
+        op.create_table(
+            table,
+            sa.Column(person_column, sa.Integer(), nullable=False),
+            *week,
+            sa.Column('start_slot', sa.SmallInteger(), nullable=False),
+            sa.Column('end_slot', sa.SmallInteger(), nullable=False),
+            sa.CheckConstraint(
+                f'start_slot >= 0 AND start_slot < end_slot AND '
+                f'end_slot <= {SLOTS_PER_WEEK}',
+                name=f'ck_{table}_slots'),
+            sa.ForeignKeyConstraint(
+                [person_column], [f'{persons}.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint(*key, 'start_slot', name=f'{table}_pkey'))
+
+
+def downgrade():
+    for table, _, _, _ in reversed(TABLES):
+        op.drop_table(table)
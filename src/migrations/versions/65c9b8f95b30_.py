@@ -0,0 +1,83 @@
+"""Availability stored as intervals of consecutive timeslots.
+
+Revision ID: 65c9b8f95b30
+Revises: 6cbb54aa7d49
+Create Date: 2026-10-18 14:02:51.774120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '65c9b8f95b30'
+down_revision = '6cbb54aa7d49'
+branch_labels = None
+depends_on = None
+
+
+SLOTS_PER_WEEK = 672
+
+# (availability table, timeslots table, person column, persons table)
+TABLES = (('employee_availability', 'employee_timeslots', 'employee_id', 'employees'),
+          ('candidate_availability', 'candidate_timeslots', 'candidate_id', 'candidates'))
+
+
+def upgrade():
+    for table, old_table, person_column, persons in TABLES:
+        op.create_table(
+            table,
+            sa.Column(person_column, sa.Integer(), nullable=False),
+            sa.Column('start_slot', sa.SmallInteger(), nullable=False),
+            sa.Column('end_slot', sa.SmallInteger(), nullable=False),
+            sa.CheckConstraint(
+                f'start_slot >= 0 AND start_slot < end_slot AND '
+                f'end_slot <= {SLOTS_PER_WEEK}',
+                name=f'ck_{table}_slots'),
+            sa.ForeignKeyConstraint(
+                [person_column], [f'{persons}.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint(person_column, 'start_slot', name=f'{table}_pkey'))
+        op.execute(f"""
+            CREATE INDEX ix_{table}_slots ON {table}
+            USING gist (int4range(start_slot, end_slot))
+        """)
+
+        # consecutive timeslots have the same difference between the timeslot
+        # and its position in person's sorted list of timeslots
+        op.execute(f"""
+            INSERT INTO {table} ({person_column}, start_slot, end_slot)
+            SELECT {person_column}, min(timeslots_id), max(timeslots_id) + 1
+            FROM (
+                SELECT {person_column}, timeslots_id,
+                       timeslots_id - row_number() OVER (
+                           PARTITION BY {person_column} ORDER BY timeslots_id) AS run
+                FROM {old_table}
+                WHERE {person_column} IS NOT NULL AND timeslots_id IS NOT NULL
+            ) AS runs
+            GROUP BY {person_column}, run
+        """)
+        op.drop_table(old_table)
+
+
+def downgrade():
+    for table, old_table, person_column, persons in TABLES:
+        op.create_table(
+            old_table,
+            sa.Column(person_column, sa.Integer(), nullable=True),
+            sa.Column('timeslots_id', sa.SmallInteger(), nullable=True),
+            sa.ForeignKeyConstraint(
+                [person_column], [f'{persons}.id'], name=f'{old_table}_{person_column}_fkey'),
+            sa.ForeignKeyConstraint(
+                ['timeslots_id'], ['timeslots.id'], name=f'{old_table}_timeslots_id_fkey'),
+            sa.UniqueConstraint(
+                person_column, 'timeslots_id',
+                name=f'uq_{old_table}_{person_column}_timeslots_id'))
+        op.create_index(
+            f'ix_{old_table}_timeslots_id_{person_column}',
+            old_table, ['timeslots_id', person_column])
+        op.execute(f"""
+            INSERT INTO {old_table} ({person_column}, timeslots_id)
+            SELECT {person_column}, generate_series(start_slot, end_slot - 1)
+            FROM {table}
+        """)
+        op.drop_table(table)
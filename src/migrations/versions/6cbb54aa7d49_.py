@@ -0,0 +1,133 @@
+"""Timeslots identified by their index within a week.
+
+Revision ID: 6cbb54aa7d49
+Revises: 7adee71f002e
+Create Date: 2026-10-18 13:25:17.640093
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '6cbb54aa7d49'
+down_revision = '7adee71f002e'
+branch_labels = None
+depends_on = None
+
+
+DAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+HOURS = tuple(str(x) for x in range(24))
+MINUTES = ('0', '15', '30', '45')
+SLOTS_PER_WEEK = len(DAYS) * len(HOURS) * len(MINUTES)
+
+# (table, column, unique constraint and index on the column if any)
+REFERENCES = (
+    ('employee_timeslots', 'timeslots_id', 'employee_id'),
+    ('candidate_timeslots', 'timeslots_id', 'candidate_id'),
+    ('interviews', 'start', None))
+
+VERBOSE_VIEW = f"""
+    CREATE VIEW timeslots_verbose AS
+    SELECT id,
+           (ARRAY[{', '.join(f"'{day}'" for day in DAYS)}])[id / 96 + 1] AS day,
+           (id % 96) / 4 AS hour,
+           (id % 4) * 15 AS minute
+    FROM timeslots
+"""
+
+
+def upgrade():
+    op.add_column('timeslots', sa.Column('slot', sa.SmallInteger(), nullable=True))
+    op.execute("""
+        UPDATE timeslots SET slot =
+            (array_position(enum_range(NULL::days_of_week), day) - 1) * 96 +
+            hour::text::integer * 4 +
+            minute::text::integer / 15
+    """)
+
+    _drop_references()
+    for table, column, _ in REFERENCES:
+        op.execute(f"""
+            UPDATE {table} SET {column} = timeslots.slot
+            FROM timeslots WHERE {table}.{column} = timeslots.id
+        """)
+        op.alter_column(table, column, type_=sa.SmallInteger())
+
+    op.drop_constraint('uq_timeslots_day_hour_minute', 'timeslots', type_='unique')
+    op.drop_constraint('timeslots_pkey', 'timeslots', type_='primary')
+    op.execute('UPDATE timeslots SET id = slot')
+    op.alter_column('timeslots', 'id', type_=sa.SmallInteger(), server_default=None)
+    op.execute('DROP SEQUENCE IF EXISTS timeslots_id_seq')
+    op.drop_column('timeslots', 'slot')
+    op.drop_column('timeslots', 'day')
+    op.drop_column('timeslots', 'hour')
+    op.drop_column('timeslots', 'minute')
+    op.create_primary_key('timeslots_pkey', 'timeslots', ['id'])
+    op.create_check_constraint(
+        'ck_timeslots_id', 'timeslots', f'id >= 0 AND id < {SLOTS_PER_WEEK}')
+    op.execute(f"""
+        INSERT INTO timeslots (id)
+        SELECT generate_series(0, {SLOTS_PER_WEEK - 1})
+        ON CONFLICT DO NOTHING
+    """)
+    _create_references()
+
+    op.execute('DROP TYPE days_of_week')
+    op.execute('DROP TYPE hours')
+    op.execute('DROP TYPE minutes')
+    op.execute(VERBOSE_VIEW)
+
+
+def downgrade():
+    op.execute('DROP VIEW timeslots_verbose')
+    days = postgresql.ENUM(*DAYS, name='days_of_week')
+    hours = postgresql.ENUM(*HOURS, name='hours')
+    minutes = postgresql.ENUM(*MINUTES, name='minutes')
+    for enum in (days, hours, minutes):
+        enum.create(op.get_bind())
+
+    _drop_references()
+    op.drop_constraint('ck_timeslots_id', 'timeslots', type_='check')
+    op.add_column('timeslots', sa.Column('day', days, nullable=True))
+    op.add_column('timeslots', sa.Column('hour', hours, nullable=True))
+    op.add_column('timeslots', sa.Column('minute', minutes, nullable=True))
+    op.execute(f"""
+        UPDATE timeslots SET
+            day = (enum_range(NULL::days_of_week))[id / 96 + 1],
+            hour = ((id % 96) / 4)::text::hours,
+            minute = ((id % 4) * 15)::text::minutes
+    """)
+    for column in ('day', 'hour', 'minute'):
+        op.alter_column('timeslots', column, nullable=False)
+    op.alter_column('timeslots', 'id', type_=sa.Integer())
+    op.execute('CREATE SEQUENCE timeslots_id_seq OWNED BY timeslots.id')
+    op.execute(f"SELECT setval('timeslots_id_seq', {SLOTS_PER_WEEK})")
+    op.alter_column('timeslots', 'id',
+                    server_default=sa.text("nextval('timeslots_id_seq'::regclass)"))
+    op.create_unique_constraint(
+        'uq_timeslots_day_hour_minute', 'timeslots', ['day', 'hour', 'minute'])
+    for table, column, _ in REFERENCES:
+        op.alter_column(table, column, type_=sa.Integer())
+    _create_references()
+
+
+def _drop_references():
+    for table, column, person_column in REFERENCES:
+        op.drop_constraint(f'{table}_{column}_fkey', table, type_='foreignkey')
+        if person_column is not None:
+            op.drop_constraint(
+                f'uq_{table}_{person_column}_{column}', table, type_='unique')
+            op.drop_index(f'ix_{table}_{column}_{person_column}', table_name=table)
+
+
+def _create_references():
+    for table, column, person_column in REFERENCES:
+        op.create_foreign_key(
+            f'{table}_{column}_fkey', table, 'timeslots', [column], ['id'])
+        if person_column is not None:
+            op.create_unique_constraint(
+                f'uq_{table}_{person_column}_{column}', table, [person_column, column])
+            op.create_index(
+                f'ix_{table}_{column}_{person_column}', table, [column, person_column])
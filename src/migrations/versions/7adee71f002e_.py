@@ -0,0 +1,43 @@
+"""Unique constraints and join indexes on availability tables.
+
+Revision ID: 7adee71f002e
+Revises: 99c06e271cea
+Create Date: 2026-10-18 12:42:05.906114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7adee71f002e'
+down_revision = '99c06e271cea'
+branch_labels = None
+depends_on = None
+
+
+TABLES = (('employee_timeslots', 'employee_id'),
+          ('candidate_timeslots', 'candidate_id'))
+
+
+def upgrade():
+    for table, person_column in TABLES:
+        op.execute(f"""
+            DELETE FROM {table} AS duplicate USING {table} AS original
+            WHERE duplicate.ctid > original.ctid
+              AND duplicate.{person_column} = original.{person_column}
+              AND duplicate.timeslots_id = original.timeslots_id
+        """)
+        op.create_unique_constraint(
+            f'uq_{table}_{person_column}_timeslots_id',
+            table, [person_column, 'timeslots_id'])
+        op.create_index(
+            f'ix_{table}_timeslots_id_{person_column}',
+            table, ['timeslots_id', person_column])
+
+
+def downgrade():
+    for table, person_column in TABLES:
+        op.drop_index(f'ix_{table}_timeslots_id_{person_column}', table_name=table)
+        op.drop_constraint(
+            f'uq_{table}_{person_column}_timeslots_id', table, type_='unique')
@@ -0,0 +1,52 @@
+"""Unique timeslots and the complete timeslots grid.
+
+Revision ID: 99c06e271cea
+Revises: 3443a69e4ad4
+Create Date: 2026-10-18 12:10:41.318220
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '99c06e271cea'
+down_revision = '3443a69e4ad4'
+branch_labels = None
+depends_on = None
+
+
+DUPLICATES = """
+    SELECT id, min(id) OVER (PARTITION BY day, hour, minute) AS keep_id
+    FROM timeslots
+"""
+
+
+def upgrade():
+    for table, column in (('employee_timeslots', 'timeslots_id'),
+                          ('candidate_timeslots', 'timeslots_id'),
+                          ('interviews', 'start')):
+        op.execute(f"""
+            UPDATE {table} SET {column} = dup.keep_id
+            FROM ({DUPLICATES}) AS dup
+            WHERE {table}.{column} = dup.id AND dup.id <> dup.keep_id
+        """)
+    op.execute(f"""
+        DELETE FROM timeslots USING ({DUPLICATES}) AS dup
+        WHERE timeslots.id = dup.id AND dup.id <> dup.keep_id
+    """)
+    op.create_unique_constraint(
+        'uq_timeslots_day_hour_minute', 'timeslots', ['day', 'hour', 'minute'])
+    op.execute("""
+        INSERT INTO timeslots (day, hour, minute)
+        SELECT day, hour, minute
+        FROM unnest(enum_range(NULL::days_of_week)) AS day,
+             unnest(enum_range(NULL::hours)) AS hour,
+             unnest(enum_range(NULL::minutes)) AS minute
+        ORDER BY day, hour, minute
+        ON CONFLICT DO NOTHING
+    """)
+
+
+def downgrade():
+    op.drop_constraint('uq_timeslots_day_hour_minute', 'timeslots', type_='unique')
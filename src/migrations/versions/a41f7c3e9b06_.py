@@ -0,0 +1,28 @@
+"""Interviews version and lookup index.
+
+Revision ID: a41f7c3e9b06
+Revises: 5e3a9c71d2f8
+Create Date: 2026-10-18 20:05:17.338102
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a41f7c3e9b06'
+down_revision = '5e3a9c71d2f8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('interviews', sa.Column(
+        'version', sa.Integer(), nullable=False, server_default='1'))
+    op.create_index(
+        'ix_interviews_employee_id_week', 'interviews', ['employee_id', 'week'])
+
+
+def downgrade():
+    op.drop_index('ix_interviews_employee_id_week', table_name='interviews')
+    op.drop_column('interviews', 'version')
@@ -0,0 +1,38 @@
+"""Archive of past interviews.
+
+Revision ID: b5d93e1f7a20
+Revises: e2b6f0a8d314
+Create Date: 2026-10-18 23:41:52.104388
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5d93e1f7a20'
+down_revision = 'e2b6f0a8d314'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'interviews_archive',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('employee_id', sa.Integer(), nullable=False),
+        sa.Column('candidate_id', sa.Integer(), nullable=False),
+        sa.Column('start', sa.SmallInteger(), nullable=False),
+        sa.Column('week', sa.Date(), nullable=False),
+        sa.Column('duration_in_timeslots', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['employee_id'], ['employees.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['candidate_id'], ['candidates.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'))
+    op.create_index('ix_interviews_archive_employee_id',
+                    'interviews_archive', ['employee_id'])
+    op.create_index('ix_interviews_archive_candidate_id',
+                    'interviews_archive', ['candidate_id'])
+
+
+def downgrade():
+    op.drop_table('interviews_archive')
@@ -0,0 +1,34 @@
+"""Persons name indexes for keyset pagination.
+
+Revision ID: c7d18e4b2a95
+Revises: a41f7c3e9b06
+Create Date: 2026-10-18 21:26:48.114853
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7d18e4b2a95'
+down_revision = 'a41f7c3e9b06'
+branch_labels = None
+depends_on = None
+
+
+TABLES = ('employees', 'candidates')
+
+
+def upgrade():
+    for table in TABLES:
+        op.create_index(f'ix_{table}_name', table, ['last_name', 'first_name'])
+        op.create_index(f'ix_{table}_last_name_pattern', table, ['last_name'],
+                        postgresql_ops={'last_name': 'text_pattern_ops'})
+    op.create_index('ix_interviews_candidate_id', 'interviews', ['candidate_id'])
+
+
+def downgrade():
+    op.drop_index('ix_interviews_candidate_id', table_name='interviews')
+    for table in TABLES:
+        op.drop_index(f'ix_{table}_last_name_pattern', table_name=table)
+        op.drop_index(f'ix_{table}_name', table_name=table)
@@ -0,0 +1,52 @@
+"""Unique persons names.
+
+Revision ID: e2b6f0a8d314
+Revises: c7d18e4b2a95
+Create Date: 2026-10-18 22:03:09.550927
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2b6f0a8d314'
+down_revision = 'c7d18e4b2a95'
+branch_labels = None
+depends_on = None
+
+
+# (persons table, interviews column)
+TABLES = (('employees', 'employee_id'), ('candidates', 'candidate_id'))
+
+
+def upgrade():
+    for table, column in TABLES:
+        # duplicates are merged into the earliest record with the same name: their
+        # interviews are moved to it, and their availability is dropped
+        ranked = f"""
+            WITH ranked AS (
+                SELECT id, min(id) OVER (PARTITION BY last_name, first_name) AS kept
+                FROM {table})
+        """
+        op.execute(f"""
+            {ranked}
+            UPDATE interviews SET {column} = ranked.kept
+            FROM ranked
+            WHERE interviews.{column} = ranked.id AND ranked.id <> ranked.kept
+        """)
+        op.execute(f"""
+            {ranked}
+            DELETE FROM {table}
+            USING ranked
+            WHERE {table}.id = ranked.id AND ranked.id <> ranked.kept
+        """)
+        op.drop_index(f'ix_{table}_name', table_name=table)
+        op.create_unique_constraint(
+            f'uq_{table}_name', table, ['last_name', 'first_name'])
+
+
+def downgrade():
+    for table, _ in TABLES:
+        op.drop_constraint(f'uq_{table}_name', table, type_='unique')
+        op.create_index(f'ix_{table}_name', table, ['last_name', 'first_name'])
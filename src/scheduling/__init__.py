@@ -0,0 +1,15 @@
+"""
+In-memory scheduling core independent of Flask and the database.
+
+Availability of persons is represented with plain integer masks of a week's
+timeslots (see `slots`), so intersecting the availability, searching for long
+enough free windows (`search`) and assigning many candidates to interviewers at
+once (`matching`) are pure functions of masks. The API endpoints load masks from
+the database and pass them here, so the same code can be reused by batch jobs
+and benchmarked without a database.
+"""
+from .slots import EMPTY, FULL_WEEK, SLOTS_PER_WEEK, TIMESLOT_DURATION
+from .slots import intersect, at_least, windows_mask, apply_diff, span
+from .search import SCHEDULING_MODES, PersonAvailability, duration_in_timeslots
+from .search import interview_starts, panel_starts, panel_members, panel_groups
+from .matching import BatchScheduler, SchedulingRequest, Assignment
@@ -0,0 +1,121 @@
+"""
+Conflict-free assignment of many candidates to interviewers at once.
+"""
+from collections import namedtuple
+
+from .slots import EMPTY, windows_mask, span, lowest, popcount
+
+
+SchedulingRequest = namedtuple(
+    'SchedulingRequest', ['candidate', 'availability', 'employees', 'length'])
+
+Assignment = namedtuple('Assignment', ['candidate', 'employee', 'start', 'length'])
+
+
+class BatchScheduler:
+    """
+    Assigns each candidate to one of interviewers from their pool so that no
+    interviewer is booked twice at the same time.
+
+    Requests are processed greedily, starting from the most constrained ones (i.e.
+    the ones having the smallest number of possible interview starts). When
+    a request cannot be placed, the scheduler tries to backtrack by moving a single
+    already placed interview that blocks one of request's options into another
+    free window. The number of such attempts is bounded by `max_repairs`.
+    """
+
+    def __init__(self, employees_masks, max_repairs=10000):
+        self.available = dict(employees_masks)
+        self.free = dict(employees_masks)
+        self.owners = {employee: {} for employee in employees_masks}
+        self.max_repairs = max_repairs
+        self._repairs = 0
+        self._requests = {}
+
+    def schedule(self, requests):
+        """
+        Returns the list of assignments and the list of requests which cannot be
+        satisfied.
+        """
+        ordered = sorted(requests, key=self._options_count)
+        self._requests = {request.candidate: request for request in requests}
+        placed, unassigned = {}, []
+        for request in ordered:
+            option = self._first_option(request)
+            if option is None:
+                option = self._repair(request, placed)
+            if option is None:
+                unassigned.append(request)
+                continue
+            self._book(request, *option)
+            placed[request.candidate] = Assignment(request.candidate, *option,
+                                                   request.length)
+        return list(placed.values()), unassigned
+
+    def _options_count(self, request):
+        return sum(
+            popcount(windows_mask(
+                request.availability & self.free.get(employee, EMPTY),
+                request.length))
+            for employee in request.employees)
+
+    def _first_option(self, request, exclude=EMPTY, exclude_employee=None):
+        for employee in request.employees:
+            free = self.free.get(employee, EMPTY)
+            if employee == exclude_employee:
+                free &= ~exclude
+            starts = windows_mask(request.availability & free, request.length)
+            if starts:
+                return employee, lowest(starts)
+        return None
+
+    def _book(self, request, employee, start):
+        window = span(start, request.length)
+        self.free[employee] &= ~window
+        owners = self.owners[employee]
+        for index in range(start, start + request.length):
+            owners[index] = request.candidate
+
+    def _release(self, request, employee, start):
+        self.free[employee] |= span(start, request.length)
+        owners = self.owners[employee]
+        for index in range(start, start + request.length):
+            del owners[index]
+
+    def _repair(self, request, placed):
+        """
+        Tries to free a window for request by moving a single blocking interview.
+        Returns the freed option or None if nothing can be moved.
+        """
+        for employee in request.employees:
+            available = self.available.get(employee, EMPTY)
+            starts = windows_mask(request.availability & available, request.length)
+            owners = self.owners.get(employee, {})
+            while starts:
+                if self._repairs >= self.max_repairs:
+                    return None
+                self._repairs += 1
+
+                start = lowest(starts)
+                starts ^= 1 << start
+                window = span(start, request.length)
+                blockers = {owners[index]
+                            for index in range(start, start + request.length)
+                            if index in owners}
+                if len(blockers) != 1:
+                    continue
+
+                blocker = self._requests[blockers.pop()]
+                previous = placed[blocker.candidate]
+                self._release(blocker, previous.employee, previous.start)
+                option = self._first_option(
+                    blocker, exclude=window, exclude_employee=employee)
+                if option is None:
+                    self._book(blocker, previous.employee, previous.start)
+                    continue
+
+                self._book(blocker, *option)
+                placed[blocker.candidate] = Assignment(blocker.candidate, *option,
+                                                       blocker.length)
+                return employee, start
+        return None
@@ -0,0 +1,67 @@
+"""
+Search of interview starts shared by a candidate and interviewers.
+"""
+from .slots import EMPTY, TIMESLOT_DURATION, FULL_WEEK, windows_mask, intersect
+from .slots import at_least, iter_indices
+
+
+SCHEDULING_MODES = ('each', 'all', 'k_of_n')
+
+
+class PersonAvailability:
+    """A person's timeslots of the week with the person's ID and name."""
+
+    __slots__ = ('id', 'name', 'mask')
+
+    def __init__(self, id, name, mask=EMPTY):
+        self.id = id
+        self.name = name
+        self.mask = mask
+
+    def __repr__(self):
+        return '%s(%r, %r, %#x)' % (type(self).__name__, self.id, self.name, self.mask)
+
+
+def duration_in_timeslots(duration):
+    """Converts duration in minutes into the number of timeslots rounding it up."""
+
+    if not isinstance(duration, int) or duration <= 0:
+        return None
+    return -(-duration // TIMESLOT_DURATION)
+
+
+def interview_starts(employees, length, candidate_mask=FULL_WEEK):
+    """
+    Returns the masks of timeslots starting `length` consecutive timeslots when
+    both the candidate and an employee are available, keyed by employee.
+    """
+    return {employee: windows_mask(employee.mask & candidate_mask, length)
+            for employee in employees}
+
+
+def panel_starts(mode, starts, required):
+    """
+    Returns the starts shared by the panel of employees: by all of them in 'all'
+    mode or by at least `required` of them in 'k_of_n' mode.
+    """
+    if mode == 'all':
+        return intersect(*starts.values())
+    return at_least(starts.values(), required)
+
+
+def panel_members(starts, index):
+    """Returns the employees who can start an interview at the timeslot."""
+
+    return [employee for employee, mask in starts.items() if mask >> index & 1]
+
+
+def panel_groups(starts, panel_mask):
+    """
+    Groups the timeslots of panel mask by the employees available at them.
+    Returns a dict mapping tuples of employees to their common timeslots.
+    """
+    groups = {}
+    for index in iter_indices(panel_mask):
+        members = tuple(panel_members(starts, index))
+        groups[members] = groups.get(members, EMPTY) | (1 << index)
+    return groups
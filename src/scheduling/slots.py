@@ -0,0 +1,177 @@
+"""
+Compact representation of a person's weekly availability.
+
+The week is split into `SLOTS_PER_WEEK` discrete timeslots (7 days x 24 hours x
+4 quarters) and every timeslot gets a fixed index. A set of timeslots is stored
+as a single integer where the bit N is set if the timeslot N is included, so
+finding common timeslots for a group of people boils down to a bitwise AND.
+"""
+import base64
+from calendar import day_name
+
+
+TIMESLOT_DURATION = 15
+MINUTES_PER_HOUR = 60
+
+days_of_week = tuple(day_name)
+hours = [str(x) for x in range(24)]
+minutes_granularity = [str(x) for x in range(0, 60, TIMESLOT_DURATION)]
+
+SLOTS_PER_HOUR = len(minutes_granularity)
+SLOTS_PER_DAY = len(hours) * SLOTS_PER_HOUR
+SLOTS_PER_WEEK = len(days_of_week) * SLOTS_PER_DAY
+
+EMPTY = 0
+FULL_WEEK = (1 << SLOTS_PER_WEEK) - 1
+
+_day_index = {day: index for index, day in enumerate(days_of_week)}
+
+
+def slot_index(day, hour, minute):
+    """Converts timeslot's day, hour and minute into its index within a week."""
+
+    return (_day_index[day] * SLOTS_PER_DAY +
+            int(hour) * SLOTS_PER_HOUR +
+            int(minute) // TIMESLOT_DURATION)
+
+
+def slot_parts(index):
+    """Converts timeslot's index back into (day, hour, minute) tuple."""
+
+    if not 0 <= index < SLOTS_PER_WEEK:
+        raise ValueError('timeslot index out of range: %d' % index)
+    day, rest = divmod(index, SLOTS_PER_DAY)
+    hour, quarter = divmod(rest, SLOTS_PER_HOUR)
+    return days_of_week[day], hour, quarter * TIMESLOT_DURATION
+
+
+def to_mask(indices):
+    """Packs an iterable of timeslot indices into a bit mask."""
+
+    mask = EMPTY
+    for index in indices:
+        mask |= 1 << index
+    return mask
+
+
+def to_indices(mask):
+    """Unpacks a bit mask into a sorted list of timeslot indices."""
+
+    return list(iter_indices(mask))
+
+
+def iter_indices(mask):
+    """Yields indices of timeslots included into mask in ascending order."""
+
+    while mask:
+        lowest = mask & -mask
+        yield lowest.bit_length() - 1
+        mask ^= lowest
+
+
+def intersect(*masks):
+    """Returns timeslots shared by all given masks."""
+
+    result = FULL_WEEK
+    for mask in masks:
+        result &= mask
+    return result
+
+
+def apply_diff(mask, added, removed):
+    """Returns mask with `added` timeslots included and `removed` ones excluded."""
+
+    return (mask | added) & ~removed
+
+
+def windows_mask(mask, length):
+    """
+    Returns a mask of timeslots starting `length` consecutive timeslots of mask.
+
+    Works directly on the bits: after each step, the bit N of the result tells if
+    the window of `covered` timeslots starting at N is free, and the covered
+    length is doubled until it reaches the requested one.
+    """
+    if length < 1:
+        raise ValueError('window length should be positive: %d' % length)
+
+    result, covered = mask, 1
+    while covered < length:
+        step = min(covered, length - covered)
+        result &= result >> step
+        covered += step
+    return result
+
+
+def span(start, length):
+    """Returns a mask of `length` consecutive timeslots beginning at `start`."""
+
+    return ((1 << length) - 1) << start
+
+
+def lowest(mask):
+    """Returns the index of the earliest timeslot included into non-empty mask."""
+
+    return (mask & -mask).bit_length() - 1
+
+
+def popcount(mask):
+    """Returns the number of timeslots included into mask."""
+
+    return bin(mask).count('1')
+
+
+def count_per_slot(masks):
+    """Counts how many of the given masks include each of timeslots."""
+
+    counters = [0] * SLOTS_PER_WEEK
+    for mask in masks:
+        for index in iter_indices(mask):
+            counters[index] += 1
+    return counters
+
+
+def at_least(masks, k):
+    """Returns timeslots included into at least `k` of the given masks."""
+
+    counters = count_per_slot(masks)
+    return to_mask(index for index, count in enumerate(counters) if count >= k)
+
+
+def to_base64(mask):
+    """
+    Encodes mask as base64 string of `SLOTS_PER_WEEK // 8` little-endian bytes, so
+    the timeslot N is the bit N % 8 of the byte N // 8.
+    """
+    return base64.b64encode(mask.to_bytes(SLOTS_PER_WEEK // 8, 'little')).decode()
+
+
+def from_base64(encoded):
+    """Decodes mask encoded with `to_base64`."""
+
+    return int.from_bytes(base64.b64decode(encoded), 'little')
+
+
+def to_intervals(mask):
+    """
+    Splits mask into the sorted list of `(start, end)` runs of consecutive
+    timeslots, where `end` is the index following the last timeslot of run.
+    """
+    intervals = []
+    while mask:
+        start = lowest(mask)
+        run = mask >> start
+        length = lowest(~run)
+        intervals.append((start, start + length))
+        mask &= ~span(start, length)
+    return intervals
+
+
+def from_intervals(intervals):
+    """Packs `(start, end)` intervals of timeslots into a bit mask."""
+
+    mask = EMPTY
+    for start, end in intervals:
+        mask |= span(start, end - start)
+    return mask
+
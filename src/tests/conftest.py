@@ -7,6 +7,7 @@ from datetime import datetime
 
 import pytest
 from flask import url_for
+from sqlalchemy import event
 
 from app import create_app, db
 from config import get_logger
@@ -59,8 +60,32 @@ class MockFlaskClient:
             return json.loads(response.get_data(as_text=True))
 
 
+class QueryCounter:
+    """Counts SQL statements executed by the database engine within a context."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def __enter__(self):
+        self.count = 0
+        event.listen(self.engine, 'before_cursor_execute', self._increment)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(self.engine, 'before_cursor_execute', self._increment)
+
+    def _increment(self, *args):
+        self.count += 1
+
+
 @pytest.fixture()
 def client(request):
     mock_client = MockFlaskClient(db, config='testing')
     request.addfinalizer(mock_client.finalize)
     return mock_client
+
+
+@pytest.fixture()
+def query_counter(client):
+    return QueryCounter(db.engine)
@@ -0,0 +1,126 @@
+import time
+
+import pytest
+
+from app import db
+from app import availability
+from app.availability import AvailabilityCache, availability_masks
+from app.models import Employee, Candidate
+from scheduling.slots import slot_index, span
+from app.weeks import next_week
+
+
+def test_cached_masks_are_outdated_by_version_bump(cache):
+    week = next_week()
+    cache.put(Employee, 1, cache.version(Employee, 1), week, 0b1010)
+
+    assert cache.get(Employee, 1, cache.version(Employee, 1), week) == 0b1010
+    assert cache.get(Candidate, 1, cache.version(Candidate, 1), week) is None
+
+    cache.bump('employee', 1)
+
+    assert cache.get(Employee, 1, cache.version(Employee, 1), week) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_least_recently_used_masks_are_evicted(cache):
+    week = next_week()
+    for person_id in range(3):
+        cache.put(Employee, person_id, 0, week, 1 << 600)
+    cache.max_bytes = cache.stats()['size_in_bytes'] - 1
+
+    cache.get(Employee, 0, 0, week)
+    cache.put(Employee, 3, 0, week, 1 << 600)
+
+    assert cache.evictions == 2
+    assert cache.get(Employee, 0, 0, week) is not None
+    assert cache.get(Employee, 1, 0, week) is None
+    assert cache.get(Employee, 2, 0, week) is None
+
+
+def test_masks_loaded_during_in_place_update_are_not_cached(cache):
+    week = next_week()
+    version, revision = cache.version(Employee, 1), cache.revision(Employee, 1)
+
+    # a booking commits while the free mask is loaded from the database
+    cache.update(Employee, 1, week, 'free', lambda free: free & ~0b10)
+    cache.put(Employee, 1, version, week, 0b1010, 'free', revision=revision)
+
+    assert cache.get(Employee, 1, version, week, 'free') is None
+
+    cache.put(Employee, 1, version, week, 0b1000, 'free',
+              revision=cache.revision(Employee, 1))
+
+    assert cache.get(Employee, 1, version, week, 'free') == 0b1000
+
+
+def test_listener_reconnects_after_connection_loss(client, monkeypatch):
+    monkeypatch.setattr(availability, 'RECONNECT_DELAY', 0.1)
+    week = next_week()
+    cache = AvailabilityCache()
+    cache.init_app(client.app)
+    cache.sync = True
+    cache.put(Employee, 1, 0, week, 0b1010)
+
+    assert cache.get(Employee, 1, 0, week) is None
+
+    cache.start_listener()
+    wait_until(lambda: cache.listening)
+    cache.put(Employee, 1, 0, week, 0b1010)
+    db.session.execute(db.text("SELECT pg_notify('availability', 'employee:1:0')"))
+    db.session.commit()
+    wait_until(lambda: cache.version(Employee, 1) == 1)
+
+    cache.put(Employee, 1, 1, week, 0b1010)
+    db.session.execute(db.text("""
+        SELECT pg_terminate_backend(pid) FROM pg_stat_activity
+        WHERE query = 'LISTEN availability' AND pid <> pg_backend_pid()
+    """))
+    db.session.commit()
+    wait_until(lambda: cache.listening and not cache.stats()['entries'])
+
+    db.session.execute(db.text("SELECT pg_notify('availability', 'employee:1:0')"))
+    db.session.commit()
+    wait_until(lambda: cache.version(Employee, 1) == 2)
+
+
+def test_allocated_availability_is_written_through(client, query_counter, mock_employee):
+    data = {'employee_id': mock_employee.id,
+            'slots': [{'day': 'Monday', 'from': '09:00', 'to': '10:00'}]}
+    client.json('main.allocate_employee_time', method='POST', data=data)
+
+    with query_counter:
+        masks = availability_masks(Employee, [mock_employee.id], next_week())
+
+    assert query_counter.count == 0
+    assert masks[mock_employee.id] == span(slot_index('Monday', 9, 0), 4)
+
+    stats = client.json('main.availability_cache_stats')
+    assert stats['hits'] >= 1
+
+
+# -------------
+# Test fixtures
+# -------------
+
+
+@pytest.fixture()
+def cache():
+    return AvailabilityCache(max_bytes=2**20)
+
+
+@pytest.fixture()
+def mock_employee():
+    employee = Employee(first_name='John', last_name='Doe')
+    db.session.add(employee)
+    db.session.commit()
+    yield employee
+    db.session.delete(employee)
+    db.session.commit()
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
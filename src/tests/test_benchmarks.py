@@ -0,0 +1,29 @@
+from app import db
+from app.models import Employee, Candidate
+from benchmarks import population, suite
+
+
+def test_generating_and_dropping_population(client):
+    generated = population.generate(5, 3, seed=2)
+
+    assert Employee.query.filter(Employee.id.in_(generated.employees_ids)).count() == 5
+    for candidate_id, mask in generated.candidates.items():
+        assert db.session.get(Candidate, candidate_id).availability_mask(
+            generated.week) == mask
+
+    population.drop(generated)
+
+    assert Employee.query.filter(Employee.id.in_(generated.employees_ids)).count() == 0
+
+
+def test_running_benchmark_suite(client):
+    report = suite.run(client.app, sizes=[3], repeat=2)
+
+    assert report['meta']['sizes'] == [3]
+    assert len(report['endpoints']) == len(suite.ENDPOINTS) * len(suite.TRANSPORTS)
+    for result in report['endpoints']:
+        assert sum(result['statuses'].values()) == result['repeat'] == 2
+        assert '500' not in result['statuses']
+    assert {result['benchmark'] for result in report['core']} == {
+        'windows_mask', 'intersect_panel', 'at_least_panel', 'interview_starts',
+        'batch_scheduler'}
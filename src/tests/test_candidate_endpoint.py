@@ -1,7 +1,13 @@
+import json
+
 import pytest
+from flask import url_for
 
 from app import db
-from app.models import Candidate
+from app.models import Candidate, Employee, Interview, Timeslot
+from app.models import CandidateAvailability, CandidateTemplate, CandidateException
+from scheduling.slots import SLOTS_PER_WEEK, to_mask
+from app.weeks import ONE_WEEK, next_week
 
 
 def test_getting_candidate(client, mockery):
@@ -35,6 +41,62 @@ def test_deleting_candidate(client, mockery):
     assert not Candidate.exists(**data)
 
 
+def test_getting_candidate_with_constant_number_of_queries(
+        client, query_counter, mockery, interviewed):
+
+    def count_queries(candidate):
+        data = {'first_name': candidate.first_name, 'last_name': candidate.last_name}
+        with query_counter:
+            result = client.json('main.candidate_endpoint', data=data)
+        assert result['success']
+        return query_counter.count, 'interview' in result
+
+    counts = [count_queries(mockery), count_queries(interviewed)]
+
+    every_other_slot = to_mask(range(0, SLOTS_PER_WEEK, 2))
+    interviewed.template.extend(CandidateTemplate.from_mask(every_other_slot))
+    for weeks in range(1, 9):
+        week = next_week() - weeks * ONE_WEEK
+        interviewed.availability.extend(
+            CandidateAvailability.from_mask(every_other_slot, week=week))
+        interviewed.exceptions.extend(
+            CandidateException.from_mask(every_other_slot, week=week))
+    db.session.commit()
+    counts.append(count_queries(interviewed))
+
+    # the candidate with the interview joined, intervals are not loaded
+    assert counts == [(1, False), (1, True), (1, True)]
+
+
+def test_listing_candidates_page_by_page(client, listed):
+    pages, params = [], {'limit': 2, 'fields': 'last_name'}
+    while True:
+        result = _list_candidates(client, **params)
+        pages.append([record['last_name'] for record in result['candidates']])
+        if result['next'] is None:
+            break
+        params['after'] = result['next']
+
+    assert pages == [['Adams', 'Baker'], ['Barnes', 'Brown'], ['Clark']]
+    assert list(result['candidates'][0]) == ['last_name']
+
+
+def test_filtering_listed_candidates(client, listed, interviewed):
+    by_prefix = _list_candidates(client, prefix='Ba')
+    interviewed_only = _list_candidates(client, has_interview='true')
+    without_interview = _list_candidates(client, has_interview='false', limit=100)
+
+    assert [c['last_name'] for c in by_prefix['candidates']] == ['Baker', 'Barnes']
+    assert [c['id'] for c in interviewed_only['candidates']] == [interviewed.id]
+    assert interviewed.id not in {c['id'] for c in without_interview['candidates']}
+    assert not _list_candidates(client, fields='password')['success']
+
+
+def _list_candidates(client, **params):
+    response = client.client.get(url_for('main.list_candidates', **params))
+    return json.loads(response.get_data(as_text=True))
+
+
 # -------------
 # Test fixtures
 # -------------
@@ -59,3 +121,34 @@ def drop_candidates():
     for employee in Candidate.query.all():
         db.session.delete(employee)
     db.session.commit()
+
+
+@pytest.fixture()
+def interviewed():
+    candidate = Candidate(first_name='Alice',
+                          last_name='Appleseed',
+                          email='alice_appleseed@mail.com')
+    employee = Employee(first_name='Bob', last_name='Smith')
+    candidate.interview = Interview(employee=employee,
+                                    start_id=Timeslot.query.first().id,
+                                    week=next_week(),
+                                    duration_in_timeslots=4)
+    db.session.add_all([candidate, employee])
+    db.session.commit()
+    yield candidate
+    db.session.delete(candidate)
+    db.session.delete(employee)
+    db.session.commit()
+
+
+@pytest.fixture()
+def listed():
+    candidates = [Candidate(first_name='Listed', last_name=last_name,
+                            email='%s@mail.com' % last_name.lower())
+                  for last_name in ('Brown', 'Adams', 'Clark', 'Barnes', 'Baker')]
+    db.session.add_all(candidates)
+    db.session.commit()
+    yield candidates
+    for candidate in candidates:
+        db.session.delete(candidate)
+    db.session.commit()
@@ -1,7 +1,8 @@
 import pytest
 
 from app import db
-from app.models import Employee
+from app.models import Employee, Candidate, Interview, Timeslot
+from app.weeks import next_week
 
 
 def test_getting_employee(client, mockery):
@@ -23,6 +24,19 @@ def test_creating_a_new_employee(client, drop_employees):
     assert result['success']
     assert 'id' in result
     assert isinstance(result['id'], int)
+    assert result['created']
+
+
+def test_creating_existing_employee(client, query_counter, mockery):
+    data = {'first_name': mockery.first_name, 'last_name': mockery.last_name}
+
+    with query_counter:
+        result = client.json('main.employee_endpoint', data=data, method='POST')
+
+    assert result['success']
+    assert result['id'] == mockery.id
+    assert not result['created']
+    assert query_counter.count == 1
 
 
 def test_deleting_employee(client, mockery):
@@ -36,6 +50,21 @@ def test_deleting_employee(client, mockery):
     assert not Employee.exists(**data)
 
 
+def test_getting_employee_with_constant_number_of_queries(
+        client, query_counter, interviewers):
+
+    counts = []
+    for employee in interviewers:
+        data = {'first_name': employee.first_name, 'last_name': employee.last_name}
+        with query_counter:
+            result = client.json('main.employee_endpoint', data=data)
+        assert len(result['interviews']) == len(employee.interviews)
+        counts.append(query_counter.count)
+
+    # the employee and their interviews, availability is not loaded
+    assert counts == [2, 2]
+
+
 # -------------
 # Test fixtures
 # -------------
@@ -57,3 +86,26 @@ def drop_employees():
     for employee in Employee.query.all():
         db.session.delete(employee)
     db.session.commit()
+
+
+@pytest.fixture()
+def interviewers():
+    timeslots = Timeslot.query.limit(3).all()
+    candidates = [Candidate(first_name='Candidate', last_name=str(i),
+                            email='candidate_%d@mail.com' % i)
+                  for i in range(4)]
+    employees = [Employee(first_name='John', last_name='Doe'),
+                 Employee(first_name='Bob', last_name='Smith')]
+    employees[0].interviews = [
+        Interview(candidate=candidates[0], start_id=timeslots[0].id, week=next_week(),
+                  duration_in_timeslots=1)]
+    employees[1].interviews = [
+        Interview(candidate=candidate, start_id=timeslot.id, week=next_week(),
+                  duration_in_timeslots=2)
+        for candidate, timeslot in zip(candidates[1:], timeslots)]
+    db.session.add_all(candidates + employees)
+    db.session.commit()
+    yield employees
+    for obj in candidates + employees:
+        db.session.delete(obj)
+    db.session.commit()
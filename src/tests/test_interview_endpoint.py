@@ -0,0 +1,94 @@
+import pytest
+
+from app import db
+from app.models import Employee, Candidate, Interview
+from app.models import EmployeeAvailability, CandidateAvailability
+from scheduling.slots import slot_index, span
+from app.weeks import next_week
+
+
+def test_booking_interview(client, persons):
+    employee, candidates = persons
+    data = _booking(employee, candidates[0], '10:00', duration=30)
+
+    result = client.json('main.interview_endpoint', data=data, method='POST')
+
+    assert result['success']
+    assert result['version'] == 1
+
+    result = client.json('main.interview_endpoint', data={'id': result['id']})
+
+    assert result['start'] == {'day': 'Monday', 'hour': 10, 'minute': 0}
+    assert result['duration_in_minutes'] == 30
+    assert result['week'] == next_week().isoformat()
+
+
+def test_booking_conflicting_interviews(client, persons):
+    employee, candidates = persons
+    client.json('main.interview_endpoint', method='POST',
+                data=_booking(employee, candidates[0], '10:00', duration=30))
+
+    overlapping = client.json('main.interview_endpoint', method='POST',
+                              data=_booking(employee, candidates[1], '10:15'))
+    rebooked = client.json('main.interview_endpoint', method='POST',
+                           data=_booking(employee, candidates[0], '11:00'))
+    unavailable = client.json('main.interview_endpoint', method='POST',
+                              data=_booking(employee, candidates[1], '11:45', 30))
+
+    for result in (overlapping, rebooked, unavailable):
+        assert not result['success']
+        assert result['error'] == 'conflict'
+
+    result = client.json('main.interview_endpoint', method='POST',
+                         data=_booking(employee, candidates[1], '10:30'))
+
+    assert result['success']
+
+
+def test_cancelling_interview(client, persons):
+    employee, candidates = persons
+    booked = client.json('main.interview_endpoint', method='POST',
+                         data=_booking(employee, candidates[0], '10:00'))
+
+    stale = client.json('main.interview_endpoint', method='DELETE',
+                        data={'id': booked['id'], 'version': booked['version'] + 1})
+
+    assert stale['error'] == 'conflict'
+
+    result = client.json('main.interview_endpoint', method='DELETE',
+                         data={'id': booked['id'], 'version': booked['version']})
+
+    assert result['success']
+    assert Interview.query.get(booked['id']) is None
+
+
+def _booking(employee, candidate, time, duration=15):
+    return {'employee': employee.id, 'candidate': candidate.id,
+            'day': 'Monday', 'time': time, 'duration': duration}
+
+
+# -------------
+# Test fixtures
+# -------------
+
+
+@pytest.fixture()
+def persons():
+    week = next_week()
+    available = span(slot_index('Monday', 10, 0), 8)
+    employee = Employee(
+        first_name='John', last_name='Doe',
+        availability=EmployeeAvailability.from_mask(available, week=week))
+    candidates = [
+        Candidate(first_name='Candidate', last_name=str(i),
+                  email='candidate_%d@mail.com' % i,
+                  availability=CandidateAvailability.from_mask(available, week=week))
+        for i in range(2)]
+    db.session.add_all([employee] + candidates)
+    db.session.commit()
+    yield employee, candidates
+    for interview in Interview.query.filter_by(employee_id=employee.id):
+        db.session.delete(interview)
+    for obj in [employee] + candidates:
+        db.session.delete(obj)
+    db.session.commit()
@@ -1,7 +1,15 @@
+import json
+
 import pytest
+from flask import url_for
 
 from app import db
-from app.models import Employee, Candidate, Timeslot
+from app.availability import availability_cache, free_masks
+from app.main.api import INTERSECTION_STRATEGIES
+from app.models import Employee, Candidate, Interview
+from app.models import EmployeeAvailability, CandidateAvailability
+from scheduling.slots import slot_index, to_mask, to_indices, from_base64
+from app.weeks import next_week
 
 
 def test_get_timeslots_for_candidate_and_interviewers(client, mockery):
@@ -15,6 +23,209 @@ def test_get_timeslots_for_candidate_and_interviewers(client, mockery):
     assert len(result['schedule']) == 3
 
 
+def test_get_timeslots_with_constant_number_of_queries(client, query_counter, mockery):
+    employee1, employee2, candidate = mockery
+
+    counts = []
+    for employees in ([employee1.id], [employee1.id, employee2.id]):
+        data = {'candidate': candidate.id, 'employees': employees, 'duration': 30}
+        availability_cache.clear()
+        with query_counter:
+            client.json('main.list_interviews', data=data)
+        counts.append(query_counter.count)
+
+    assert counts[0] == counts[1]
+
+
+def test_get_timeslots_computed_by_database(client, mockery):
+    employee1, employee2, candidate = mockery
+    data = {'candidate': candidate.id, 'employees': [employee1.id, employee2.id]}
+
+    expected = client.json('main.list_interviews', data=data)
+    data['strategy'] = 'sql'
+    result = client.json('main.list_interviews', data=data)
+
+    assert result['success']
+    assert result['schedule'] == expected['schedule']
+
+
+def test_streaming_timeslots_as_ndjson(client, mockery):
+    employee1, employee2, candidate = mockery
+    data = {'candidate': candidate.id, 'employees': [employee1.id, employee2.id]}
+
+    expected = client.json('main.list_interviews', data=data)
+    response = client.client.open(
+        url_for('main.list_interviews'),
+        data=json.dumps(data),
+        headers={'Content-Type': 'application/json',
+                 'Accept': 'application/x-ndjson'})
+
+    assert response.mimetype == 'application/x-ndjson'
+    lines = response.get_data(as_text=True).splitlines()
+    assert [json.loads(line) for line in lines] == expected['schedule']
+
+
+def test_get_timeslots_as_indices(client, mockery):
+    employee1, employee2, candidate = mockery
+    data = {'candidate': candidate.id, 'employees': [employee1.id, employee2.id]}
+
+    result = client.client.open(
+        url_for('main.list_interviews', encoding='indices'),
+        data=json.dumps(data),
+        headers={'Content-Type': 'application/json'}).get_json()
+
+    assert result['encoding'] == 'indices'
+    assert result['schedule'] == [{
+        'interviewer': employee2.full_name,
+        'slots': [slot_index('Tuesday', 12, 0),
+                  slot_index('Tuesday', 12, 15),
+                  slot_index('Friday', 14, 0)]}]
+
+
+def test_get_timeslots_as_mask(client, mockery):
+    employee1, employee2, candidate = mockery
+    data = {'candidate': candidate.id, 'employees': [employee1.id, employee2.id]}
+
+    result = client.client.open(
+        url_for('main.list_interviews'),
+        data=json.dumps(data),
+        headers={'Content-Type': 'application/json',
+                 'Accept': 'application/vnd.lanxess.mask+json'}).get_json()
+
+    assert result['encoding'] == 'mask'
+    assert [record['interviewer'] for record in result['schedule']] == [
+        employee2.full_name]
+    assert to_indices(from_base64(result['schedule'][0]['slots'])) == [
+        slot_index('Tuesday', 12, 0),
+        slot_index('Tuesday', 12, 15),
+        slot_index('Friday', 14, 0)]
+
+
+def test_get_timeslots_for_long_interview(client, mockery):
+    employee1, employee2, candidate = mockery
+    data = {'candidate': candidate.id,
+            'employees': [employee1.id, employee2.id],
+            'duration': 30}
+
+    result = client.json('main.list_interviews', data=data)
+
+    assert result['success']
+    assert result['schedule'] == [{
+        'interviewer': employee2.full_name,
+        'day': 'Tuesday',
+        'hour': 12,
+        'minute': 0}]
+
+
+def test_get_timeslots_for_whole_panel(client, mockery):
+    employee1, employee2, candidate = mockery
+    data = {'candidate': candidate.id,
+            'employees': [employee1.id, employee2.id],
+            'mode': 'all'}
+
+    result = client.json('main.list_interviews', data=data)
+
+    assert not result['success']
+    assert result['message'] == 'no available timeslots'
+
+
+def test_get_timeslots_for_part_of_panel(client, mockery):
+    employee1, employee2, candidate = mockery
+    data = {'candidate': candidate.id,
+            'employees': [employee1.id, employee2.id],
+            'mode': 'k_of_n',
+            'k': 1}
+
+    result = client.json('main.list_interviews', data=data)
+
+    assert result['success']
+    assert len(result['schedule']) == 3
+    assert all(record['interviewers'] == [employee2.full_name]
+               for record in result['schedule'])
+
+
+def test_scheduling_batch_of_candidates(client, mockery):
+    employee1, employee2, candidate = mockery
+    data = {'requests': [{'candidate': candidate.id,
+                          'employees': [employee1.id, employee2.id],
+                          'duration': 30}]}
+
+    result = client.json('main.schedule_batch', data=data, method='POST')
+
+    assert result['success']
+    assert result['unassigned'] == []
+    assert result['interviews'] == [{
+        'candidate': candidate.id,
+        'employee': employee2.id,
+        'duration_in_timeslots': 2,
+        'day': 'Tuesday',
+        'hour': 12,
+        'minute': 0}]
+
+    result = client.json('main.schedule_batch', data=data, method='POST')
+
+    assert result['success']
+    assert result['interviews'] == []
+    assert result['unassigned'] == [candidate.id]
+
+
+def test_get_timeslots_expanded_from_template(client, mockery):
+    employee1, _, candidate = mockery
+    data = {'candidate': candidate.id, 'employees': [employee1.id]}
+    template = {'employee_id': employee1.id,
+                'slots': [{'day': 'Friday', 'from': '14:00', 'to': '15:00'}]}
+    exception = {'employee_id': employee1.id, 'available': False,
+                 'slots': [{'day': 'Friday', 'time': '14:00'}]}
+
+    assert not client.json('main.list_interviews', data=data)['success']
+
+    client.json('main.employee_template', data=template, method='POST')
+    result = client.json('main.list_interviews', data=data)
+
+    assert result['schedule'] == [
+        {'interviewer': 'John Doe', 'day': 'Friday', 'hour': 14, 'minute': 0}]
+    data['strategy'] = 'sql'
+    assert client.json('main.list_interviews', data=data) == result
+
+    client.json('main.allocate_employee_time', data=exception, method='POST')
+
+    assert not client.json('main.list_interviews', data=data)['success']
+    data['strategy'] = 'bitset'
+    assert not client.json('main.list_interviews', data=data)['success']
+
+
+def test_booked_timeslots_are_excluded_incrementally(client, query_counter, mockery):
+    _, employee2, candidate = mockery
+    employee_id = employee2.id
+    data = {'candidate': candidate.id, 'employees': [employee_id]}
+    week = next_week()
+    available = free_masks([employee_id], week)[employee_id]
+
+    interview = Interview(employee=employee2, candidate=candidate, week=week,
+                          start_id=slot_index('Tuesday', 12, 0), duration_in_timeslots=1)
+    db.session.add(interview)
+    db.session.commit()
+    with query_counter:
+        booked = free_masks([employee_id], week)[employee_id]
+
+    assert query_counter.count == 0
+    assert booked == available & ~(1 << slot_index('Tuesday', 12, 0))
+    for strategy in INTERSECTION_STRATEGIES:
+        data['strategy'] = strategy
+        result = client.json('main.list_interviews', data=data)
+        assert [(record['day'], record['hour'], record['minute'])
+                for record in result['schedule']] == [
+            ('Tuesday', 12, 15), ('Friday', 14, 0)]
+
+    db.session.delete(interview)
+    db.session.commit()
+    with query_counter:
+        released = free_masks([employee_id], week)[employee_id]
+
+    assert query_counter.count == 0
+    assert released == available
+
+
 # -------------
 # Test fixtures
 # -------------
@@ -23,38 +234,41 @@ def test_get_timeslots_for_candidate_and_interviewers(client, mockery):
 @pytest.fixture()
 def mockery():
     timeslots = [
-        Timeslot(day='Monday', hour='10', minute='0'),    # 0
-        Timeslot(day='Monday', hour='10', minute='15'),   # 1
-        Timeslot(day='Monday', hour='10', minute='30'),   # 2
-        Timeslot(day='Monday', hour='10', minute='45'),   # 3
-        Timeslot(day='Monday', hour='11', minute='0'),    # 4
-        Timeslot(day='Monday', hour='11', minute='15'),   # 5
-        Timeslot(day='Monday', hour='11', minute='30'),   # 6
-        Timeslot(day='Tuesday', hour='12', minute='0'),   # 7
-        Timeslot(day='Tuesday', hour='12', minute='15'),  # 8
-        Timeslot(day='Tuesday', hour='12', minute='30'),  # 9
-        Timeslot(day='Tuesday', hour='12', minute='45'),  # 10
-        Timeslot(day='Friday', hour='14', minute='0'),    # 11
-        Timeslot(day='Friday', hour='14', minute='15')    # 12
+        _timeslot(day='Monday', hour='10', minute='0'),    # 0
+        _timeslot(day='Monday', hour='10', minute='15'),   # 1
+        _timeslot(day='Monday', hour='10', minute='30'),   # 2
+        _timeslot(day='Monday', hour='10', minute='45'),   # 3
+        _timeslot(day='Monday', hour='11', minute='0'),    # 4
+        _timeslot(day='Monday', hour='11', minute='15'),   # 5
+        _timeslot(day='Monday', hour='11', minute='30'),   # 6
+        _timeslot(day='Tuesday', hour='12', minute='0'),   # 7
+        _timeslot(day='Tuesday', hour='12', minute='15'),  # 8
+        _timeslot(day='Tuesday', hour='12', minute='30'),  # 9
+        _timeslot(day='Tuesday', hour='12', minute='45'),  # 10
+        _timeslot(day='Friday', hour='14', minute='0'),    # 11
+        _timeslot(day='Friday', hour='14', minute='15')    # 12
     ]
 
     employee1 = Employee(
         first_name='John',
         last_name='Doe',
-        availability=timeslots[:7],
+        availability=EmployeeAvailability.from_mask(
+            to_mask(timeslots[:7]), week=next_week()),
     )
 
     employee2 = Employee(
         first_name='Bob',
         last_name='Smith',
-        availability=timeslots[5:]
+        availability=EmployeeAvailability.from_mask(
+            to_mask(timeslots[5:]), week=next_week())
     )
 
     candidate = Candidate(
         first_name='Alice',
         last_name='Appleseed',
         email='alice_appleseed@mail.com',
-        availability=[timeslots[7], timeslots[8], timeslots[11]]
+        availability=CandidateAvailability.from_mask(
+            to_mask([timeslots[7], timeslots[8], timeslots[11]]), week=next_week())
     )
 
     for obj in (employee1, employee2, candidate):
@@ -66,3 +280,7 @@ def mockery():
     for obj in (employee1, employee2, candidate):
         db.session.delete(obj)
     db.session.commit()
+
+
+def _timeslot(day, hour, minute):
+    return slot_index(day, hour, minute)
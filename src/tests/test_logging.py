@@ -0,0 +1,70 @@
+import json
+import logging
+from queue import Queue
+
+import config
+from config import JsonFormatter, DroppingQueueHandler, get_logger
+
+
+def test_configuring_logging_once():
+    get_logger('main')
+    listeners = list(config._listeners)
+
+    log = get_logger('errors')
+
+    assert config._listeners == listeners
+    assert [type(handler) for handler in log.handlers].count(DroppingQueueHandler) == 1
+
+
+def test_formatting_records_as_json():
+    record = logging.makeLogRecord({
+        'name': 'requests', 'levelno': logging.INFO, 'levelname': 'INFO',
+        'msg': '%s %d', 'args': ('GET /api/v1/echo', 200),
+        'request_id': 'abc', 'duration': 0.25})
+
+    entry = json.loads(JsonFormatter().format(record))
+
+    assert entry['message'] == 'GET /api/v1/echo 200'
+    assert entry['request_id'] == 'abc'
+    assert entry['duration'] == 0.25
+    assert entry['logger'] == 'requests'
+
+
+def test_formatting_exceptions_logged_through_queue():
+    handler = DroppingQueueHandler(Queue())
+    log = logging.getLogger('test_queued_exceptions')
+    log.propagate = False
+    log.addHandler(handler)
+
+    try:
+        raise ValueError('invalid value %s')
+    except ValueError:
+        log.exception('failed with %d', 42)
+    log.removeHandler(handler)
+
+    entry = json.loads(JsonFormatter().format(handler.queue.get_nowait()))
+
+    assert entry['message'] == 'failed with 42'
+    assert entry['exception'].startswith('Traceback')
+    assert 'ValueError: invalid value %s' in entry['exception']
+
+
+def test_dropping_records_when_queue_is_full():
+    handler = DroppingQueueHandler(Queue(2))
+    log = logging.getLogger('test_dropping_records')
+    log.propagate = False
+    log.addHandler(handler)
+
+    for i in range(5):
+        log.warning('record %d', i)
+    assert handler.dropped == 3
+
+    handler.queue.get_nowait()
+    handler.queue.get_nowait()
+    log.warning('record 5')
+
+    assert handler.dropped == 0
+    assert handler.queue.get_nowait().getMessage() == (
+        '3 log records dropped as the logging queue was full')
+    assert handler.queue.get_nowait().getMessage() == 'record 5'
+    log.removeHandler(handler)
@@ -0,0 +1,27 @@
+from scheduling.matching import BatchScheduler, SchedulingRequest
+from scheduling.slots import to_mask, span
+
+
+def test_scheduling_without_conflicts():
+    scheduler = BatchScheduler({1: to_mask([1, 2])})
+    requests = [SchedulingRequest('A', to_mask([1, 2]), [1], 1),
+                SchedulingRequest('B', to_mask([1, 2]), [1], 1),
+                SchedulingRequest('C', to_mask([2]), [1], 1)]
+
+    assignments, unassigned = scheduler.schedule(requests)
+
+    assert sorted((a.candidate, a.start) for a in assignments) == [('A', 1), ('C', 2)]
+    assert [request.candidate for request in unassigned] == ['B']
+
+
+def test_moving_blocking_interview_to_another_window():
+    employees = {1: to_mask([1, 2, 3])}
+    requests = [SchedulingRequest('A', to_mask([2, 3]), [1], 1),
+                SchedulingRequest('B', to_mask([1, 2, 3]), [1], 2)]
+
+    _, unassigned = BatchScheduler(employees, max_repairs=0).schedule(requests)
+    assignments, _ = BatchScheduler(employees).schedule(requests)
+
+    assert [request.candidate for request in unassigned] == ['B']
+    windows = {a.candidate: span(a.start, a.length) for a in assignments}
+    assert windows == {'A': span(3, 1), 'B': span(1, 2)}
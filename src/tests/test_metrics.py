@@ -0,0 +1,94 @@
+import logging
+
+import pytest
+
+from app import db
+from app.metrics import request_metrics
+from app.models import Employee
+
+
+def test_exposing_request_metrics(client):
+    client.json('main.echo')
+    client.json('main.availability_cache_stats')
+
+    response = client.client.get('/api/v1/metrics')
+    text = response.get_data(as_text=True)
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    assert '# TYPE lanxess_http_request_duration_seconds histogram' in text
+    assert ('lanxess_http_responses_total'
+            '{route="/api/v1/echo",method="GET",status="200"} 1') in text
+    assert ('lanxess_http_request_duration_seconds_bucket'
+            '{route="/api/v1/echo",method="GET",le="+Inf"} 1') in text
+    assert ('lanxess_http_request_sql_statements_count'
+            '{route="/api/v1/availability_cache",method="GET"} 1') in text
+
+
+def test_counting_request_sql_statements(client, mock_employee):
+    data = {'first_name': mock_employee.first_name, 'last_name': mock_employee.last_name}
+    client.json('main.employee_endpoint', data=data)
+
+    text = client.client.get('/api/v1/metrics').get_data(as_text=True)
+
+    assert ('lanxess_http_request_sql_statements_bucket'
+            '{route="/api/v1/employee",method="GET",le="1.0"} 0') in text
+    assert ('lanxess_http_request_sql_statements_bucket'
+            '{route="/api/v1/employee",method="GET",le="+Inf"} 1') in text
+
+
+def test_passing_request_id_through(client):
+    response = client.client.get('/api/v1/echo', headers={'X-Request-ID': 'abc'})
+
+    assert response.headers['X-Request-ID'] == 'abc'
+    assert client.client.get('/api/v1/echo').headers['X-Request-ID'] != 'abc'
+
+
+def test_metrics_are_not_exposed_to_remote_hosts(client):
+    response = client.client.get('/api/v1/metrics',
+                                 environ_base={'REMOTE_ADDR': '10.0.0.1'})
+
+    assert response.status_code == 403
+
+
+def test_logging_slow_request_queries(client, mock_employee, slow_requests_log):
+    data = {'first_name': mock_employee.first_name, 'last_name': mock_employee.last_name}
+    client.json('main.employee_endpoint', data=data)
+
+    assert 'Slow request GET /api/v1/employee' in slow_requests_log[0]
+    assert any('FROM employees' in message for message in slow_requests_log[1:])
+
+
+# -------------
+# Test fixtures
+# -------------
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    request_metrics.clear()
+    yield
+    request_metrics.clear()
+
+
+@pytest.fixture()
+def mock_employee():
+    employee = Employee(first_name='John', last_name='Doe')
+    db.session.add(employee)
+    db.session.commit()
+    yield employee
+    db.session.delete(employee)
+    db.session.commit()
+
+
+@pytest.fixture()
+def slow_requests_log(client):
+    messages = []
+    handler = logging.Handler()
+    handler.emit = lambda record: messages.append(record.getMessage())
+    threshold = request_metrics.slow_request_seconds
+    request_metrics.slow_request_seconds = 0
+    client.app.custom_logger.addHandler(handler)
+    yield messages
+    client.app.custom_logger.removeHandler(handler)
+    request_metrics.slow_request_seconds = threshold
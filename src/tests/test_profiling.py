@@ -0,0 +1,65 @@
+import os
+
+import pytest
+
+from app.profiling import request_profiler, enforce_quota
+
+
+def test_profiling_request_with_header(client, profiles_dir):
+    client.json('main.echo', headers={'X-Profile': '1'})
+    request_profiler.join()
+
+    profiles = os.listdir(profiles_dir)
+    assert len(profiles) == 1
+    assert '_main.echo_' in profiles[0]
+    with open(os.path.join(profiles_dir, profiles[0])) as file:
+        for line in file:
+            stack, samples = line.rsplit(' ', 1)
+            assert int(samples) > 0
+            assert stack.split(';')[-1]
+
+
+def test_requests_without_header_are_not_profiled(client, profiles_dir):
+    client.json('main.echo')
+    request_profiler.join()
+
+    assert not os.path.exists(profiles_dir) or not os.listdir(profiles_dir)
+
+
+def test_sampling_every_nth_request(client, profiles_dir):
+    request_profiler.sample_every = 3
+    for _ in range(7):
+        client.json('main.echo')
+    request_profiler.join()
+
+    assert len(os.listdir(profiles_dir)) == 2
+
+
+def test_removing_oldest_profiles_over_quota(tmp_path):
+    for i, name in enumerate(['first', 'second', 'third']):
+        path = tmp_path / ('%s.folded' % name)
+        path.write_text('main.run 1\n' * 10)
+        os.utime(path, (i, i))
+    (tmp_path / 'notes.txt').write_text('x' * 1000)
+
+    removed = enforce_quota(str(tmp_path), 150)
+
+    assert removed == ['first.folded', 'second.folded']
+    assert sorted(os.listdir(tmp_path)) == ['notes.txt', 'third.folded']
+
+
+# -------------
+# Test fixtures
+# -------------
+
+
+@pytest.fixture()
+def profiles_dir(client, tmp_path):
+    settings = (request_profiler.enabled, request_profiler.sample_every,
+                request_profiler.directory)
+    request_profiler.enabled = True
+    request_profiler.sample_every = 0
+    request_profiler.directory = str(tmp_path / 'profiles')
+    yield request_profiler.directory
+    (request_profiler.enabled, request_profiler.sample_every,
+     request_profiler.directory) = settings
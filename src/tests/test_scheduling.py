@@ -0,0 +1,73 @@
+import os
+import sys
+import subprocess
+
+import pytest
+
+from scheduling import PersonAvailability, duration_in_timeslots
+from scheduling import interview_starts, panel_starts, panel_members, panel_groups
+from scheduling.slots import to_mask, to_indices
+
+
+def test_converting_duration_into_timeslots():
+    assert duration_in_timeslots(15) == 1
+    assert duration_in_timeslots(40) == 3
+    assert duration_in_timeslots(0) is None
+    assert duration_in_timeslots('30') is None
+
+
+def test_finding_interview_starts(employees):
+    john, bob, _ = employees
+
+    starts = interview_starts([john, bob], 2, candidate_mask=to_mask([1, 2, 3, 4, 5]))
+
+    assert to_indices(starts[john]) == [1, 2]
+    assert to_indices(starts[bob]) == [3, 4]
+
+
+def test_finding_panel_starts(employees):
+    starts = interview_starts(employees, 1)
+
+    assert to_indices(panel_starts('all', starts, len(employees))) == [3]
+    assert to_indices(panel_starts('k_of_n', starts, 2)) == [2, 3, 4, 5]
+    assert [employee.name for employee in panel_members(starts, 5)] == ['Bob', 'Eve']
+
+
+def test_grouping_panel_timeslots_by_members(employees):
+    john, bob, eve = employees
+    starts = interview_starts(employees, 1)
+
+    groups = panel_groups(starts, panel_starts('k_of_n', starts, 2))
+
+    assert {members: to_indices(mask) for members, mask in groups.items()} == {
+        (john, eve): [2], (john, bob, eve): [3], (bob, eve): [4, 5]}
+
+
+def test_person_availability_has_no_instance_dict():
+    person = PersonAvailability(1, 'John')
+
+    assert person.mask == 0
+    with pytest.raises(AttributeError):
+        person.email = 'john@mail.com'
+
+
+def test_importing_scheduling_core_without_app():
+    code = ('import sys, scheduling; '
+            'assert not {"app", "config", "flask"} & set(sys.modules)')
+    env = {key: value for key, value in os.environ.items()
+           if not key.startswith('APP_')}
+
+    subprocess.check_call([sys.executable, '-c', code], env=env,
+                          cwd=os.path.dirname(os.path.dirname(__file__)))
+
+
+# -------------
+# Test fixtures
+# -------------
+
+
+@pytest.fixture()
+def employees():
+    return [PersonAvailability(1, 'John', to_mask([0, 1, 2, 3])),
+            PersonAvailability(2, 'Bob', to_mask([3, 4, 5, 6])),
+            PersonAvailability(3, 'Eve', to_mask([2, 3, 4, 5]))]
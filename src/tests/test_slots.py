@@ -0,0 +1,60 @@
+from scheduling.slots import SLOTS_PER_WEEK, FULL_WEEK
+from scheduling.slots import slot_index, slot_parts, to_mask, to_indices
+from scheduling.slots import intersect, at_least
+from scheduling.slots import to_base64, from_base64
+from scheduling.slots import to_intervals, from_intervals, apply_diff
+
+
+def test_week_is_split_into_quarters():
+    assert SLOTS_PER_WEEK == 7 * 24 * 4
+    assert slot_index('Monday', '0', '0') == 0
+    assert slot_index('Sunday', '23', '45') == SLOTS_PER_WEEK - 1
+
+
+def test_converting_index_back_to_timeslot():
+    index = slot_index('Tuesday', 12, 30)
+
+    assert slot_parts(index) == ('Tuesday', 12, 30)
+
+
+def test_intersecting_masks():
+    first = to_mask([1, 2, 3, 10])
+    second = to_mask([2, 3, 4, 10, 11])
+    third = to_mask([3, 10, 20])
+
+    assert to_indices(intersect(first, second, third)) == [3, 10]
+    assert intersect() == FULL_WEEK
+
+
+def test_applying_diff_to_mask():
+    template = to_mask([1, 2, 3])
+
+    assert to_indices(apply_diff(template, to_mask([5]), to_mask([2, 5, 7]))) == [1, 3]
+    assert to_indices(apply_diff(template, to_mask([5]), 0)) == [1, 2, 3, 5]
+
+
+def test_searching_timeslots_shared_by_k_of_n_masks():
+    masks = [to_mask([1, 2, 3]), to_mask([2, 3, 4]), to_mask([3, 4, 5])]
+
+    assert to_indices(at_least(masks, 1)) == [1, 2, 3, 4, 5]
+    assert to_indices(at_least(masks, 2)) == [2, 3, 4]
+    assert to_indices(at_least(masks, 3)) == [3]
+
+
+def test_converting_mask_into_intervals():
+    mask = to_mask([0, 1, 2, 5, 7, 8, SLOTS_PER_WEEK - 1])
+
+    intervals = to_intervals(mask)
+
+    assert intervals == [(0, 3), (5, 6), (7, 9), (SLOTS_PER_WEEK - 1, SLOTS_PER_WEEK)]
+    assert from_intervals(intervals) == mask
+    assert to_intervals(FULL_WEEK) == [(0, SLOTS_PER_WEEK)]
+
+
+def test_encoding_mask_as_base64():
+    mask = to_mask([0, 9, SLOTS_PER_WEEK - 1])
+
+    encoded = to_base64(mask)
+
+    assert len(encoded) == 112
+    assert from_base64(encoded) == mask
@@ -1,7 +1,15 @@
+from datetime import date, timedelta
+
 import pytest
 
 from app import db
-from app.models import Employee
+from app.models import Employee, Candidate, Interview, ArchivedInterview
+from app.models import EmployeeAvailability, EmployeeException
+from app.partitions import PARTITIONED_TABLES, create_partitions, prune_past_weeks
+from app.partitions import create_partition, drop_partition, week_partitions
+from scheduling.slots import SLOTS_PER_WEEK, slot_index, from_intervals
+from scheduling.slots import to_mask
+from app.weeks import ONE_WEEK, current_week, next_week
 
 
 def test_allocating_free_timeslot_for_employee(client, mock_employee):
@@ -16,6 +24,210 @@ def test_allocating_free_timeslot_for_employee(client, mock_employee):
     assert result['timeslots'][0]['minute'] == 30
 
 
+def test_allocating_range_of_timeslots_for_employee(client, mock_employee):
+    data = {'employee_id': mock_employee.id,
+            'slots': [{'day': 'Monday', 'from': '09:00', 'to': '17:00'},
+                      {'day': 'Monday', 'from': '16:00', 'to': '18:00'},
+                      {'day': 'Friday', 'time': '10:20'}]}
+
+    result = client.json('main.allocate_employee_time', method='POST', data=data)
+
+    assert result['success']
+    assert len(result['timeslots']) == 9 * 4 + 1
+
+    result = client.json('main.allocate_employee_time', method='POST', data=data)
+
+    assert result['success']
+    assert len(result['timeslots']) == 9 * 4 + 1
+
+    db.session.refresh(mock_employee)
+    assert [(interval.start_slot, interval.end_slot)
+            for interval in mock_employee.availability] == [
+        (slot_index('Monday', 9, 0), slot_index('Monday', 18, 0)),
+        (slot_index('Friday', 10, 15), slot_index('Friday', 10, 30))]
+
+
+def test_allocating_range_until_end_of_day(client, mock_employee):
+    data = {'employee_id': mock_employee.id,
+            'slots': [{'day': 'Sunday', 'from': '23:00', 'to': '24:00'}]}
+
+    result = client.json('main.allocate_employee_time', method='POST', data=data)
+
+    assert result['success']
+    db.session.refresh(mock_employee)
+    assert [(interval.start_slot, interval.end_slot)
+            for interval in mock_employee.availability] == [
+        (slot_index('Sunday', 23, 0), SLOTS_PER_WEEK)]
+
+
+@pytest.mark.parametrize('start, end', [('17:00', '09:00'),
+                                        ('09:00', '09:00'),
+                                        ('24:00', '24:00')])
+def test_allocating_inverted_range(client, mock_employee, start, end):
+    data = {'employee_id': mock_employee.id,
+            'slots': [{'day': 'Monday', 'from': start, 'to': end}]}
+
+    result = client.json('main.allocate_employee_time', method='POST', data=data)
+
+    assert not result['success']
+    assert result['error'] == 'bad request'
+
+
+def test_allocating_free_timeslots_for_candidate(client, mock_candidate):
+    data = {'candidate_id': mock_candidate.id,
+            'slots': [{'day': 'Wednesday', 'from': '10:00', 'to': '11:00'}]}
+
+    result = client.json('main.allocate_candidate_time', method='POST', data=data)
+
+    assert result['success']
+    assert sorted((ts['hour'], ts['minute']) for ts in result['timeslots']) == [
+        (10, 0), (10, 15), (10, 30), (10, 45)]
+
+
+def test_allocating_timeslots_for_specific_week(client, mock_employee):
+    week = next_week() + ONE_WEEK
+    data = {'employee_id': mock_employee.id,
+            'week': (week + timedelta(days=3)).isoformat(),
+            'slots': [{'day': 'Monday', 'from': '09:00', 'to': '10:00'}]}
+
+    result = client.json('main.allocate_employee_time', method='POST', data=data)
+
+    assert result['success']
+    assert result['week'] == week.isoformat()
+
+    db.session.refresh(mock_employee)
+    assert mock_employee.availability_mask(next_week()) == 0
+    assert [(interval.week, interval.start_slot, interval.end_slot)
+            for interval in mock_employee.availability] == [
+        (week, slot_index('Monday', 9, 0), slot_index('Monday', 10, 0))]
+
+
+def test_allocating_timeslots_beyond_horizon(client, mock_employee):
+    data = {'employee_id': mock_employee.id,
+            'week': '1999-01-01',
+            'slots': [{'day': 'Monday', 'from': '09:00', 'to': '10:00'}]}
+
+    result = client.json('main.allocate_employee_time', method='POST', data=data)
+
+    assert not result['success']
+
+
+def test_creating_weekly_partition(client, mock_employee, partitions):
+    # a week far beyond the horizon is never touched by other tests
+    week = next_week() + 100 * ONE_WEEK
+    mock_employee.availability.extend(EmployeeAvailability.from_mask(
+        to_mask([slot_index('Friday', 9, 0)]), week=week))
+    db.session.commit()
+
+    name = partitions.create('employee_availability', week)
+
+    assert week_partitions('employee_availability')[week] == name
+    assert name == 'employee_availability_%s' % week.strftime('%Y%m%d')
+    db.session.refresh(mock_employee)
+    assert mock_employee.availability_mask(week) != 0
+
+
+def test_locked_tables_partitions_are_skipped(client, monkeypatch):
+    monkeypatch.setattr('app.partitions.LOCK_TIMEOUT', '50ms')
+    today = next_week() + 101 * ONE_WEEK
+    with db.engine.connect() as connection:
+        transaction = connection.begin()
+        connection.execute(db.text(
+            'LOCK TABLE %s IN ACCESS SHARE MODE' % ', '.join(PARTITIONED_TABLES)))
+        created = create_partitions(1, today)
+        transaction.rollback()
+
+    assert created == []
+    for table in PARTITIONED_TABLES:
+        assert today not in week_partitions(table)
+
+
+def test_pruning_past_weeks(client, mock_employee, mock_candidate):
+    # weeks long before any other test's data, so only the test's rows are pruned
+    today = date(1990, 1, 3)
+    past, current = current_week(today) - ONE_WEEK, current_week(today)
+    for week in (past, current):
+        mock_employee.exceptions.extend(EmployeeException.from_mask(
+            to_mask([slot_index('Monday', 9, 0)]), week=week))
+    interview = Interview(employee=mock_employee, candidate=mock_candidate,
+                          start_id=slot_index('Monday', 10, 0), week=past,
+                          duration_in_timeslots=4)
+    db.session.add(interview)
+    db.session.commit()
+    interview_id = interview.id
+
+    assert prune_past_weeks(today) == (1, 1)
+
+    db.session.expire_all()
+    assert [e.week for e in mock_employee.exceptions] == [current]
+    assert mock_employee.interviews == []
+    archived = ArchivedInterview.query.get(interview_id)
+    assert (archived.employee_id, archived.week) == (mock_employee.id, past)
+
+
+def test_replacing_employee_template(client, mock_employee):
+    data = {'employee_id': mock_employee.id,
+            'slots': [{'day': 'Monday', 'from': '10:00', 'to': '12:00'},
+                      {'day': 'Tuesday', 'from': '10:00', 'to': '12:00'}]}
+
+    result = client.json('main.employee_template', method='POST', data=data)
+
+    assert result['success']
+    assert 'week' not in result
+    assert len(result['timeslots']) == 2 * 8
+
+    data['slots'] = [{'day': 'Monday', 'from': '10:00', 'to': '11:00'}]
+    client.json('main.employee_template', method='POST', data=data)
+    result = client.json('main.employee_template', data={'employee_id': mock_employee.id})
+
+    assert len(result['timeslots']) == 4
+
+
+def test_excluding_template_timeslots_from_week(client, mock_employee):
+    template = {'employee_id': mock_employee.id,
+                'slots': [{'day': 'Monday', 'from': '10:00', 'to': '12:00'}]}
+    client.json('main.employee_template', method='POST', data=template)
+    data = {'employee_id': mock_employee.id, 'available': False,
+            'slots': [{'day': 'Monday', 'from': '11:00', 'to': '13:00'}]}
+
+    result = client.json('main.allocate_employee_time', method='POST', data=data)
+
+    assert result['success']
+    assert len(result['timeslots']) == 4
+
+    data['available'] = True
+    data['slots'] = [{'day': 'Monday', 'time': '11:00'}]
+    result = client.json('main.allocate_employee_time', method='POST', data=data)
+
+    assert len(result['timeslots']) == 5
+    db.session.refresh(mock_employee)
+    assert mock_employee.allocated_mask(next_week()) == 1 << slot_index('Monday', 11, 0)
+    assert mock_employee.exceptions_mask(next_week()) == (
+        from_intervals([(slot_index('Monday', 11, 15), slot_index('Monday', 13, 0))]))
+
+
+def test_allocating_time_with_constant_number_of_queries(
+        client, query_counter, mock_employee):
+
+    data = {'employee_id': mock_employee.id,
+            'slots': [{'day': 'Monday', 'from': '09:00', 'to': '10:00'}]}
+    with query_counter:
+        client.json('main.allocate_employee_time', method='POST', data=data)
+    count = query_counter.count
+
+    every_other_slot = to_mask(range(0, SLOTS_PER_WEEK, 2))
+    for weeks in range(1, 9):
+        mock_employee.availability.extend(EmployeeAvailability.from_mask(
+            every_other_slot, week=next_week() - weeks * ONE_WEEK))
+    db.session.commit()
+    data['slots'] = [{'day': 'Monday', 'from': '10:00', 'to': '11:00'}]
+    with query_counter:
+        result = client.json('main.allocate_employee_time', method='POST', data=data)
+
+    assert query_counter.count == count
+    assert len(result['timeslots']) == 8
+
+
 # -------------
 # Test fixtures
 # -------------
@@ -29,3 +241,33 @@ def mock_employee():
     yield employee
     db.session.delete(employee)
     db.session.commit()
+
+
+@pytest.fixture()
+def partitions():
+    """Creates partitions through `create` and drops them after the test."""
+
+    class Partitions:
+        def __init__(self):
+            self.created = []
+
+        def create(self, table, week):
+            name = create_partition(table, week)
+            self.created.append((table, week))
+            return name
+
+    created = Partitions()
+    yield created
+    db.session.rollback()
+    for table, week in created.created:
+        drop_partition(table, week)
+
+
+@pytest.fixture()
+def mock_candidate():
+    candidate = Candidate(first_name='Alice', last_name='Doe', email='alice@mail.com')
+    db.session.add(candidate)
+    db.session.commit()
+    yield candidate
+    db.session.delete(candidate)
+    db.session.commit()
@@ -0,0 +1,27 @@
+from datetime import date, datetime
+
+from scheduling.slots import slot_index
+from app.weeks import week_of, next_week, horizon, parse_week, slot_datetime
+
+
+TODAY = date(2026, 10, 15)  # Thursday
+
+
+def test_weeks_are_identified_by_monday():
+    assert week_of(TODAY) == date(2026, 10, 12)
+    assert next_week(TODAY) == date(2026, 10, 19)
+    assert horizon(3, TODAY) == [
+        date(2026, 10, 12), date(2026, 10, 19), date(2026, 10, 26)]
+
+
+def test_parsing_week_within_horizon():
+    assert parse_week('2026-10-22', 2, TODAY) == date(2026, 10, 19)
+    assert parse_week('2026-10-26', 2, TODAY) is None
+    assert parse_week('2026-10-05', 2, TODAY) is None
+    assert parse_week('next week', 2, TODAY) is None
+
+
+def test_converting_timeslot_into_datetime():
+    index = slot_index('Wednesday', 9, 45)
+
+    assert slot_datetime(date(2026, 10, 19), index) == datetime(2026, 10, 21, 9, 45)